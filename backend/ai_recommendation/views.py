@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -8,7 +7,10 @@ from django.utils.decorators import method_decorator
 from django.core.cache import cache
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from portfolio.models import Portfolio, Stock, InterestedStock, HistoricalPrice
+from portfolio.models import Portfolio, Stock, InterestedStock
+from portfolio.column_store import load_history, to_dicts
+from portfolio.price_store import price_store
+from portfolio.http_clients import http_post
 
 from django.conf import settings
 
@@ -40,29 +42,14 @@ def _get_user_interests(user):
     return [s.upper() for s in syms]
 
 
-def _get_live_price_from_cache(symbol):
-    cached = cache.get(f"price:{symbol.upper()}")
-    if isinstance(cached, dict):
-        return cached.get("latestPrice")
-    if isinstance(cached, (int, float)):
-        return float(cached)
-    return None
+def _get_live_prices_from_cache(symbols):
+    records = price_store.get_many(symbols)
+    return {sym: records[sym].price if sym in records else None for sym in symbols}
 
 
 def _get_recent_history(symbol, days=30):
     start_date = datetime.utcnow().date() - timedelta(days=days + 5)
-    qs = HistoricalPrice.objects.filter(symbol=symbol.upper(), date__gte=start_date).order_by("date")
-    return [
-        {
-            "date": hp.date.isoformat(),
-            "open": hp.open,
-            "high": hp.high,
-            "low": hp.low,
-            "close": hp.close,
-            "volume": hp.volume,
-        }
-        for hp in qs
-    ]
+    return to_dicts(load_history(symbol.upper(), start=start_date))
 
 
 def _build_prompt(user):
@@ -71,7 +58,7 @@ def _build_prompt(user):
     all_symbols = sorted({*(h["symbol"] for h in holdings), *interests})
 
     # Live prices snapshot
-    live_prices = {sym: _get_live_price_from_cache(sym) for sym in all_symbols}
+    live_prices = _get_live_prices_from_cache(all_symbols)
 
     # Small recent history subset to control token usage
     history = {sym: _get_recent_history(sym, days=30) for sym in all_symbols}
@@ -123,11 +110,11 @@ def _call_openrouter(system_prompt, user_payload):
             # Encourage strict JSON from supported models
             "response_format": {"type": "json_object"},
         }
-        resp = requests.post(
+        resp = http_post(
+            "openrouter",
             "https://openrouter.ai/api/v1/chat/completions",
             headers=headers,
             json=body,
-            timeout=60,
         )
         resp.raise_for_status()
         data = resp.json()
@@ -92,20 +92,40 @@ import json
 import websockets
 from django.utils.timezone import now
 from django.conf import settings
-from django.core.cache import cache
 from .models import Alert
 from channels.db import database_sync_to_async
 from .email_utils import send_alert_email
+from portfolio.ingestion import backoff_delay
+from portfolio.price_store import PriceRecord, price_store
 
-FINNHUB_WS_URL = f"wss://ws.finnhub.io?token={settings.FINNHUB_API_KEY}"
+FINNHUB_WS_URL = f"{settings.FINNHUB_WS_URL}?token={settings.FINNHUB_API_KEY}"
 
 async def price_stream(user):
+    """
+    Supervised alert stream: reconnect with jittered exponential backoff and
+    resubscribe to the user's active alert symbols after every upstream drop.
+    Returns once the user has no active alerts left.
+    """
+    attempt = 0
+    while True:
+        received = await _price_stream_once(user)
+        if received is None:
+            return
+        attempt = 0 if received else attempt + 1
+        delay = backoff_delay(attempt)
+        print(f"Backend WebSocket reconnecting in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def _price_stream_once(user):
     """
     Stream prices from Finnhub, compare with alerts.
     - Prefer live price
-    - If no live price, use Redis cache
+    - Record every tick in the shared price store
+    Returns whether any message arrived, or None when there is nothing to watch.
     """
     ws = None
+    received = False
     try:
         ws = await websockets.connect(FINNHUB_WS_URL)
         # Subscribe to all symbols that have active alerts
@@ -114,12 +134,15 @@ async def price_stream(user):
             .values_list("symbol", flat=True)
             .distinct()
         ))()
+        if not symbols:
+            return None
         for sym in symbols:
             await ws.send(json.dumps({"type": "subscribe", "symbol": sym}))
 
         while True:
             try:
                 msg = await ws.recv()
+                received = True
             except websockets.ConnectionClosedError as e:
                 print(f"Backend WebSocket closed unexpectedly: {e}")
                 break
@@ -134,8 +157,8 @@ async def price_stream(user):
                     symbol = trade["s"]
                     live_price = float(trade["p"])
 
-                    # ✅ update Redis cache with latest known price
-                    cache.set(f"price:{symbol}", live_price, timeout=60)
+                    # ✅ update the shared price store with latest known price
+                    await price_store.aset_many({symbol: PriceRecord(live_price, timestamp=trade.get("t"))})
 
                     # ✅ check all alerts for this symbol
                     alerts = await database_sync_to_async(lambda: list(
@@ -150,8 +173,8 @@ async def price_stream(user):
                     for alert in alerts:
                         target = float(alert.target_price)
 
-                        # Always prefer live price, else fall back to cache
-                        current_price = live_price or cache.get(f"price:{symbol}")
+                        # The tick itself is the freshest price there is
+                        current_price = live_price
 
                         if current_price is None:
                             continue  # no price yet
@@ -206,4 +229,5 @@ async def price_stream(user):
                     # Fallback for older versions
                     await ws.close()
         except Exception as e:
-            print(f"Error closing websocket: {e}")
\ No newline at end of file
+            print(f"Error closing websocket: {e}")
+    return received
@@ -44,10 +44,10 @@ from rest_framework import status
 from .models import Alert
 from .serializers import AlertSerializer
 from django.conf import settings
-from django.core.cache import cache
-import requests
 from django.contrib.auth import get_user_model
 from .email_utils import send_alert_email
+from portfolio.price_store import PriceRecord, price_store
+from portfolio.quotes import get_quote, read_quotes
 
 
 # List & Create alerts
@@ -100,52 +100,33 @@ def check_alerts(request):
     """Lightweight check for user's alerts without opening a long-lived WS.
 
     For each active alert symbol:
-    - Try Redis cache (price:{symbol}).
-    - Fallback to Finnhub REST quote (c field).
+    - Try the shared price store (one read for all symbols); stale prices are
+      used as-is and refreshed in the background.
+    - Fallback to a Finnhub REST quote, shared with other workers missing the same symbol.
     - Update alerts if triggered.
     Returns list of triggered alerts for the user.
     """
     user = request.user
     # Unique symbols for active, untriggered alerts
-    symbols = (
+    symbols = list(
         Alert.objects.filter(user=user, enabled=True, triggered=False)
         .values_list("symbol", flat=True)
         .distinct()
     )
 
     finnhub_token = getattr(settings, "FINNHUB_API_KEY", None)
-    base_url = "https://finnhub.io/api/v1/quote"
 
+    cached = read_quotes(symbols)
     latest_prices = {}
     for sym in symbols:
-        cached = cache.get(f"price:{sym}")
-        price = None
-        if isinstance(cached, dict):
-            price = cached.get("latestPrice")
-        elif isinstance(cached, (int, float)):
-            price = float(cached)
+        price = cached[sym].price if sym in cached else None
 
         if price is None and finnhub_token:
             try:
-                r = requests.get(base_url, params={"symbol": sym, "token": finnhub_token}, timeout=8)
-                if r.ok:
-                    j = r.json() or {}
-                    c = j.get("c")
-                    pc = j.get("pc")
-                    price = float(c) if c is not None else None
-                    if price is not None:
-                        change = (price - pc) if (pc is not None) else None
-                        change_percent = ((change / pc) * 100) if (change is not None and pc) else None
-                        cache.set(
-                            f"price:{sym}",
-                            {
-                                "latestPrice": price,
-                                "change": change,
-                                "changePercent": change_percent,
-                                "timestamp": None,
-                            },
-                            timeout=60,
-                        )
+                quote = get_quote(sym, wait=8)
+                if quote.get("latestPrice") is not None:
+                    price = float(quote["latestPrice"])
+                    price_store.set_many({sym: PriceRecord.from_update(quote)})
             except Exception:
                 # Ignore network errors here; leave price as None
                 pass
@@ -213,11 +194,8 @@ def trigger_alert(request, pk):
         try:
             to_email = getattr(alert.user, 'email', None)
             if to_email:
-                cached_price = cache.get(f"price:{alert.symbol}")
-                if isinstance(cached_price, dict):
-                    cached_current = cached_price.get("latestPrice")
-                else:
-                    cached_current = cached_price
+                record = price_store.get(alert.symbol)
+                cached_current = record.price if record else None
                 send_alert_email(
                     to_email=to_email,
                     symbol=alert.symbol,
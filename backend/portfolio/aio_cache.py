@@ -0,0 +1,91 @@
+"""Native asyncio access to the default cache for async hot paths.
+
+Django 4.2's RedisCache implements its ``a*`` methods by running the sync
+client in a thread. These helpers talk to Redis through ``redis.asyncio``
+instead, reusing RedisCache's key prefixing and serializer so entries are
+shared with the sync API. Non-Redis backends (locmem in dev and load tests)
+fall back to Django's async methods.
+
+redis.asyncio connections belong to the event loop that opened them, so
+there is one client per running loop.
+"""
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+
+serializer = RedisSerializer()
+_clients = weakref.WeakKeyDictionary()  # event loop -> redis.asyncio.Redis
+
+
+def redis_location():
+    location = settings.CACHES["default"]["LOCATION"]
+    if isinstance(location, (list, tuple)):
+        return location[0]
+    return location.split(",")[0]
+
+
+def backend(alias="default"):
+    return caches[alias]
+
+
+def client():
+    """redis.asyncio client for the running loop, or None if the cache is not Redis."""
+    if not isinstance(backend(), RedisCache):
+        return None
+    loop = asyncio.get_running_loop()
+    redis_client = _clients.get(loop)
+    if redis_client is None:
+        redis_client = aioredis.from_url(redis_location())
+        _clients[loop] = redis_client
+    return redis_client
+
+
+def make_key(key):
+    return backend().make_key(key)
+
+
+async def aget(key, default=None):
+    redis_client = client()
+    if redis_client is None:
+        return await backend().aget(key, default)
+    raw = await redis_client.get(make_key(key))
+    return default if raw is None else serializer.loads(raw)
+
+
+async def aget_many(keys):
+    keys = list(keys)
+    if not keys:
+        return {}
+    redis_client = client()
+    if redis_client is None:
+        return await backend().aget_many(keys)
+    raw = await redis_client.mget([make_key(k) for k in keys])
+    return {k: serializer.loads(v) for k, v in zip(keys, raw) if v is not None}
+
+
+async def aset(key, value, timeout):
+    redis_client = client()
+    if redis_client is None:
+        await backend().aset(key, value, timeout=timeout)
+        return
+    await redis_client.set(make_key(key), serializer.dumps(value), ex=int(timeout))
+
+
+async def aadd(key, value, timeout):
+    """Set ``key`` only if it is absent; returns whether it was set."""
+    redis_client = client()
+    if redis_client is None:
+        return await backend().aadd(key, value, timeout=timeout)
+    return bool(await redis_client.set(make_key(key), serializer.dumps(value), ex=int(timeout), nx=True))
+
+
+async def adelete(key):
+    redis_client = client()
+    if redis_client is None:
+        await backend().adelete(key)
+        return
+    await redis_client.delete(make_key(key))
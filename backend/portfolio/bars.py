@@ -0,0 +1,179 @@
+"""Incremental intraday OHLCV bars built from the live trade stream.
+
+The ingestor feeds every trade message to a BarAggregator, which keeps the
+open bar per symbol and interval. A timer in the ingestor calls ``flush``
+every FLUSH_INTERVAL, whether or not trades arrive. Each flush closes bars
+whose window has ended and upserts completed bars to IntradayBar in bulk.
+It also publishes, per symbol and interval, the bars not yet in the table
+(the open one plus any whose write failed), so ``intraday_bars`` can serve a
+current view without touching the upstream API.
+
+A bar is only *full* if the aggregator was watching the symbol when the
+bar's window opened. Bars that began before that (a late subscription, a
+reconnect, an unsubscribe mid-bar) are partial. They are inserted only where
+no row exists yet, so they never overwrite a full bar written by a process
+that saw the whole window.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import IntradayBar
+
+INTERVALS = {"1m": 60, "5m": 300, "15m": 900}
+SESSION_BARS = 390     # one regular session of 1m bars
+FLUSH_INTERVAL = 15    # seconds between bulk writes of completed bars
+PRUNE_INTERVAL = 3600  # seconds between retention deletes
+LIVE_BAR_TTL = 3600
+
+UPSERT = {
+    "batch_size": 1000,
+    "update_conflicts": True,
+    "unique_fields": ["symbol", "interval", "start"],
+    "update_fields": ["open", "high", "low", "close", "volume"],
+}
+
+
+def live_bar_key(symbol, interval):
+    return f"bars:{symbol}:{interval}:live"
+
+
+class BarAggregator:
+    def __init__(self, intervals=INTERVALS):
+        self.intervals = intervals
+        self.open_bars = {}  # (symbol, interval) -> bar being built
+        self.closed = {}     # (symbol, interval) -> start of the newest completed bar
+        self.unflushed = []  # completed bars not yet persisted
+        self.dirty = set()   # (symbol, interval) whose unpersisted bars changed since the last publish
+        self.watching = {}   # symbol -> unix time trades have been arriving since
+        self.last_prune = 0.0
+
+    def watch(self, symbols, now=None):
+        """Trades for ``symbols`` arrive from ``now`` on (after a subscribe or reconnect)."""
+        now = time.time() if now is None else now
+        for sym in symbols:
+            self.watching.setdefault(sym, now)
+
+    def unwatch(self, symbols=None):
+        """Trades stop for ``symbols`` (all when None); their open bars can no longer be full."""
+        symbols = list(self.watching) if symbols is None else symbols
+        for sym in symbols:
+            self.watching.pop(sym, None)
+        gone = set(symbols)
+        for key, bar in self.open_bars.items():
+            if key[0] in gone:
+                bar["partial"] = True
+
+    def add_trades(self, trades):
+        for trade in trades:
+            sym = trade["s"]
+            price = float(trade["p"])
+            volume = float(trade.get("v") or 0)
+            secs = trade["t"] // 1000
+            since = self.watching.get(sym)
+            for name, length in self.intervals.items():
+                start = secs - secs % length
+                key = (sym, name)
+                if start <= self.closed.get(key, -1):
+                    continue  # late trade for a bar that is already closed
+                bar = self.open_bars.get(key)
+                if bar is not None and start > bar["start"]:
+                    self._complete(key)
+                    bar = None
+                if bar is None:
+                    bar = {
+                        "start": start, "open": price, "high": price, "low": price, "close": price,
+                        "volume": 0.0, "partial": since is None or since > start,
+                    }
+                    self.open_bars[key] = bar
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["close"] = price
+                bar["volume"] += volume
+                self.dirty.add(key)
+
+    def _complete(self, key):
+        bar = self.open_bars.pop(key)
+        self.closed[key] = bar["start"]
+        self.unflushed.append((key, bar))
+        self.dirty.add(key)
+
+    def roll(self, now=None):
+        """Close open bars whose window has ended, even if no later trade arrived."""
+        now = int(now if now is not None else time.time())
+        for key, bar in list(self.open_bars.items()):
+            if bar["start"] + self.intervals[key[1]] <= now:
+                self._complete(key)
+
+    def close_all(self):
+        """Complete every open bar; used when the ingestor stops with bars still open."""
+        self.unwatch()
+        for key in list(self.open_bars):
+            self._complete(key)
+
+    async def flush(self):
+        """Upsert completed bars and publish what the table does not have yet."""
+        self.roll()
+        # Trades keep arriving while this awaits, so take the work up front
+        completed, self.unflushed = self.unflushed, []
+        dirty, self.dirty = self.dirty, set()
+        if completed:
+            try:
+                await database_sync_to_async(_upsert_bars)(completed)
+            except Exception as e:
+                print(f"[BARS] could not store {len(completed)} bars, will retry: {e}")
+                self.unflushed = completed + self.unflushed
+        pending = {}
+        for key, bar in self.unflushed:
+            pending.setdefault(key, []).append(bar)
+        live = {}
+        for key in dirty:
+            bars = pending.get(key, [])
+            if key in self.open_bars:
+                bars = bars + [self.open_bars[key]]
+            live[live_bar_key(*key)] = bars
+        # Keys with failed writes stay dirty so they are republished after the retry
+        self.dirty |= set(pending)
+        stale = [k for k, bars in live.items() if not bars]
+        if stale:
+            await cache.adelete_many(stale)
+        if len(stale) < len(live):
+            await cache.aset_many({k: bars for k, bars in live.items() if bars}, timeout=LIVE_BAR_TTL)
+        if time.monotonic() - self.last_prune >= PRUNE_INTERVAL:
+            self.last_prune = time.monotonic()
+            try:
+                await database_sync_to_async(_prune_bars)()
+            except Exception as e:
+                print(f"[BARS] retention delete failed: {e}")
+
+
+def _rows(bars):
+    return [
+        IntradayBar(
+            symbol=sym,
+            interval=interval,
+            start=datetime.fromtimestamp(bar["start"], tz=timezone.utc),
+            open=bar["open"],
+            high=bar["high"],
+            low=bar["low"],
+            close=bar["close"],
+            volume=bar["volume"],
+        )
+        for (sym, interval), bar in bars
+    ]
+
+
+def _upsert_bars(completed):
+    IntradayBar.objects.bulk_create(_rows([c for c in completed if not c[1]["partial"]]), **UPSERT)
+    # Partial bars only fill gaps; a full bar from another process wins
+    IntradayBar.objects.bulk_create(
+        _rows([c for c in completed if c[1]["partial"]]), batch_size=1000, ignore_conflicts=True
+    )
+
+
+def _prune_bars():
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.INTRADAY_BAR_RETENTION_DAYS)
+    IntradayBar.objects.filter(start__lt=cutoff).delete()
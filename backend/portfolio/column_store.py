@@ -0,0 +1,240 @@
+"""Memory-mapped column store in front of HistoricalPrice.
+
+Each symbol's daily bars are kept as one contiguous ``.npy`` file per column::
+
+    {HISTORY_COLUMN_DIR}/{SYMBOL}/{version}/date.npy     datetime64[D]
+    {HISTORY_COLUMN_DIR}/{SYMBOL}/{version}/open.npy     float64 (high, low, close alike)
+    {HISTORY_COLUMN_DIR}/{SYMBOL}/{version}/volume.npy   int64
+    {HISTORY_COLUMN_DIR}/{SYMBOL}/CURRENT                name of the live version
+
+``load_history`` returns zero-copy slices of the memory-mapped columns. A
+symbol that has no files yet is read from the table once and written out
+(read-through). ``history.store_daily`` merges every write into the live
+version, so the store never needs a full reload from the table.
+
+Writers build a new version directory and then swap CURRENT with
+``os.replace``. Readers therefore always see one consistent set of columns,
+and mappings that are still open keep the version they started with. Writes
+hold the symbol's LOCK file, so processes sharing the directory never merge
+over each other or clean up a version another one is still writing. Reads
+that hit an I/O error fall back to the table. With HISTORY_COLUMN_DIR unset,
+``load_history`` returns the same arrays built straight from the table.
+"""
+import os
+import re
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from django.conf import settings
+
+from .models import HistoricalPrice
+
+COLUMNS = {
+    "date": "datetime64[D]",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<i8",
+}
+
+
+def _safe_symbol(symbol):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", symbol)
+
+
+def to_columns(rows):
+    """Columns from (date, open, high, low, close, volume) tuples, oldest first."""
+    if not rows:
+        return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+    values = list(zip(*rows))
+    return {column: np.asarray(values[i], dtype=dtype) for i, (column, dtype) in enumerate(COLUMNS.items())}
+
+
+def to_dicts(bars):
+    """API candle dicts ({"date": "YYYY-MM-DD", "open": ...}) from {column: array} bars."""
+    dates = bars["date"].astype(str).tolist()
+    values = [bars[column].tolist() for column in ("open", "high", "low", "close", "volume")]
+    return [
+        {"date": d, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for d, o, h, l, c, v in zip(dates, *values)
+    ]
+
+
+def _from_table(symbol, start=None, end=None):
+    qs = HistoricalPrice.objects.filter(symbol=symbol)
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    return to_columns(list(qs.order_by("date").values_list(*COLUMNS)))
+
+
+def _slice(columns, start=None, end=None):
+    dates = columns["date"]
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"), side="left")
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+    return {column: values[lo:hi] for column, values in columns.items()}
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on ``path`` across processes (blocks until it is free)."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class HistoryColumnStore:
+    def __init__(self, root):
+        self.root = root
+        self.mapped = {}  # symbol -> (version, columns) for the version last opened
+        self.lock = threading.Lock()
+
+    def _dir(self, symbol):
+        return os.path.join(self.root, _safe_symbol(symbol))
+
+    @contextmanager
+    def _locked(self, symbol):
+        """Held around every write: one thread here, one process on the directory."""
+        with self.lock:
+            os.makedirs(self._dir(symbol), exist_ok=True)
+            with _file_lock(os.path.join(self._dir(symbol), "LOCK")):
+                yield
+
+    def _current(self, symbol):
+        try:
+            with open(os.path.join(self._dir(symbol), "CURRENT")) as fh:
+                return fh.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _open(self, symbol):
+        """Mapped columns of the live version, or None if the symbol has no files."""
+        version = self._current(symbol)
+        if version is None:
+            return None
+        cached = self.mapped.get(symbol)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        path = os.path.join(self._dir(symbol), version)
+        try:
+            columns = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column in COLUMNS}
+        except FileNotFoundError:
+            return None  # replaced and cleaned up under us; the caller rebuilds or reads the table
+        self.mapped[symbol] = (version, columns)
+        return columns
+
+    def _write(self, symbol, columns):
+        base = self._dir(symbol)
+        version = uuid.uuid4().hex
+        path = os.path.join(base, version)
+        os.makedirs(path)
+        for column, values in columns.items():
+            np.save(os.path.join(path, f"{column}.npy"), np.ascontiguousarray(values, dtype=COLUMNS[column]))
+        tmp = os.path.join(base, f"CURRENT.{version}")
+        with open(tmp, "w") as fh:
+            fh.write(version)
+        os.replace(tmp, os.path.join(base, "CURRENT"))
+        # Under the LOCK no other version is being written, so everything else
+        # is stale. Open mappings keep their data alive on POSIX, and Windows
+        # simply refuses until they close
+        for name in os.listdir(base):
+            if name != version and not name.startswith("CURRENT") and name != "LOCK":
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+    def load(self, symbol, start=None, end=None):
+        """Zero-copy {column: array} slices for dates in [start, end]."""
+        try:
+            columns = self._open(symbol)
+            if columns is None:
+                with self._locked(symbol):
+                    columns = self._open(symbol)
+                    if columns is None:
+                        self._write(symbol, _from_table(symbol))
+                        columns = self._open(symbol)
+        except (OSError, ValueError) as e:
+            print(f"[HISTORY] column store unreadable for {symbol}, reading the table: {e}")
+            columns = None
+        if columns is None:
+            return _from_table(symbol, start, end)
+        return _slice(columns, start, end)
+
+    def merge(self, symbol, rows, keep):
+        """Fold written HistoricalPrice rows into the live version, keeping the newest ``keep`` days.
+
+        Symbols without files are left for the next ``load`` to build from the
+        table, so a partial write never becomes the whole history.
+        """
+        if not rows:
+            return
+        try:
+            if self._current(symbol) is None:
+                return  # no files yet; don't create the directory just to lock it
+            with self._locked(symbol):
+                columns = self._open(symbol)
+                if columns is None:
+                    return
+                new = to_columns(sorted((row.date, row.open, row.high, row.low, row.close, row.volume) for row in rows))
+                # Rows for dates we already hold replace them
+                old = ~np.isin(columns["date"], new["date"])
+                merged = {column: np.concatenate([columns[column][old], new[column]]) for column in COLUMNS}
+                order = np.argsort(merged["date"], kind="stable")[-keep:]
+                self._write(symbol, {column: values[order] for column, values in merged.items()})
+        except (OSError, ValueError) as e:
+            # The table has the rows; drop the live version so the next load rebuilds from it
+            print(f"[HISTORY] column store merge failed for {symbol}, rebuilding on next load: {e}")
+            try:
+                os.remove(os.path.join(self._dir(symbol), "CURRENT"))
+            except OSError:
+                pass
+
+    def drop(self, symbol):
+        with self.lock:
+            self.mapped.pop(symbol, None)
+            shutil.rmtree(self._dir(symbol), ignore_errors=True)
+
+
+_stores = {}
+
+
+def column_store():
+    """The store for HISTORY_COLUMN_DIR, or None when it is not configured."""
+    root = settings.HISTORY_COLUMN_DIR
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = HistoryColumnStore(root)
+    return _stores[root]
+
+
+def load_history(symbol, start=None, end=None):
+    """Daily bars of ``symbol`` in [start, end] as {column: array}, oldest first.
+
+    Arrays are read-only views into the memory-mapped store when it is
+    configured; otherwise they are built from the table for this call.
+    """
+    store = column_store()
+    if store is None:
+        return _from_table(symbol, start, end)
+    return store.load(symbol, start, end)
@@ -1,99 +1,195 @@
+import re
 import json
-import asyncio
-import websockets
 import time
+import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
-from django.core.cache import cache  # use Django cache
+
+from .ingestion import (
+    PRICES_GROUP, PRICES_LAYER, WORKER_REACQUIRE_INTERVAL, acquire_symbols, release_symbols, symbol_group,
+)
+from .price_store import price_store
+from .wire import select_encoder
+
+
+# Tickers as Finnhub spells them (AAPL, BRK.B, BINANCE:BTCUSDT); anything else
+# is rejected before it reaches a channel-layer group or the upstream feed
+SYMBOL_RE = re.compile(r"^[A-Z0-9.:_-]{1,20}$")
 
 
 class LivePriceConsumer(AsyncWebsocketConsumer):
+    MAX_SYMBOLS = 100  # per connection, across connect + subscribe messages
+    channel_layer_alias = PRICES_LAYER
+
     async def connect(self):
-        await self.accept()
         import urllib.parse
         query_string = self.scope.get('query_string', b'').decode()
         params = urllib.parse.parse_qs(query_string)
+        # Wire format: ?format=json|columnar|msgpack or a prices.<format> subprotocol
+        self.encoder, subprotocol = select_encoder(
+            params.get('format', [None])[0], self.scope.get('subprotocols', [])
+        )
+        await self.accept(subprotocol=subprotocol)
         user_id = params.get('user_id', [None])[0]
         print(f"[WS DEBUG] user_id from query: {user_id}")
         if user_id:
-            from asgiref.sync import sync_to_async
-            from .models import InterestedStock
-            symbols = await sync_to_async(list)(InterestedStock.objects.filter(user_id=user_id).values_list('symbol', flat=True))
+            from .watchlists import aget_watchlist
+            symbols = await aget_watchlist(user_id)
             print(f"[WS DEBUG] interested symbols for user {user_id}: {symbols}")
-            self.symbols = list(symbols) if symbols else ["AAPL"]
+            symbols = [s for s in symbols if SYMBOL_RE.match(s)]
+            self.symbols = symbols[:self.MAX_SYMBOLS] if symbols else ["AAPL"]
         else:
             print("[WS DEBUG] no user_id provided, using default symbol AAPL")
             self.symbols = ["AAPL"]
         print(f"[WS DEBUG] final symbols used: {self.symbols}")
-        self.running = True
-        self.prev_prices = {}
-        asyncio.create_task(self.stream_prices())
 
-    async def disconnect(self, close_code):
-        self.running = False
+        # Conflation: at most max_rate pushes/sec, keeping only the latest tick per symbol
+        self.push_interval = self._push_interval(params.get('max_rate', [None])[0])
+        self.pending = {}
+        self.last_push = 0.0
+        self.flush_task = None
+        self.reacquire_task = None
+
+        # Ticks come from the shared ingestor through one group per symbol
+        await self.channel_layer.group_add(PRICES_GROUP, self.channel_name)
+        for sym in self.symbols:
+            await self.channel_layer.group_add(symbol_group(sym), self.channel_name)
+        await acquire_symbols(self.channel_name, self.symbols)
+        if settings.PRICE_INGESTION_WORKER:
+            self.reacquire_task = asyncio.create_task(self._reacquire())
+        await self.send_snapshot()
 
-    async def stream_prices(self):
-        finnhub_url = f"wss://ws.finnhub.io?token={settings.FINNHUB_API_KEY}"
+    async def disconnect(self, close_code):
+        for task in (getattr(self, "flush_task", None), getattr(self, "reacquire_task", None)):
+            if task is not None:
+                task.cancel()
+        await self.channel_layer.group_discard(PRICES_GROUP, self.channel_name)
+        for sym in getattr(self, "symbols", []):
+            await self.channel_layer.group_discard(symbol_group(sym), self.channel_name)
+        await release_symbols(self.channel_name)
+
+    async def _reacquire(self):
+        # The worker keeps subscriptions in memory; a restart would otherwise leave this socket silent
+        while True:
+            await asyncio.sleep(WORKER_REACQUIRE_INTERVAL)
+            try:
+                await acquire_symbols(self.channel_name, self.symbols)
+            except Exception as e:
+                print(f"[WS] re-acquire failed: {e}")
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """Client protocol: {"action": "subscribe" | "unsubscribe" | "snapshot", "symbols": [...]}"""
+        try:
+            message = json.loads(text_data or "{}")
+        except ValueError:
+            await self.send_error("Invalid JSON")
+            return
+        if not isinstance(message, dict):
+            await self.send_error("Expected a JSON object")
+            return
+        action = message.get("action")
+        symbols = message.get("symbols")
+        if symbols is None:
+            symbols = [message["symbol"]] if message.get("symbol") else []
+        if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+            await self.send_error("symbols must be a list of strings")
+            return
+        symbols = [s.strip().upper() for s in symbols if s.strip()]
+        invalid = [s for s in symbols if not SYMBOL_RE.match(s)]
+        if invalid:
+            await self.send_error(f"Invalid symbols: {', '.join(s[:20] for s in invalid[:5])}")
+            return
+        if action == "subscribe":
+            await self.subscribe(symbols)
+        elif action == "unsubscribe":
+            await self.unsubscribe(symbols)
+        elif action == "snapshot":
+            await self.send_snapshot(symbols or None)
+        else:
+            await self.send_error(f"Unknown action: {action}")
+
+    async def send_error(self, error):
+        await self.send(text_data=json.dumps({"error": error}))
+
+    async def subscribe(self, symbols):
+        added = [sym for sym in dict.fromkeys(symbols) if sym not in self.symbols]
+        room = self.MAX_SYMBOLS - len(self.symbols)
+        if len(added) > room:
+            await self.send(text_data=json.dumps({"error": f"Symbol limit is {self.MAX_SYMBOLS}"}))
+            added = added[:max(room, 0)]
+        for sym in added:
+            await self.channel_layer.group_add(symbol_group(sym), self.channel_name)
+        self.symbols.extend(added)
+        await acquire_symbols(self.channel_name, added)
+        await self.send(text_data=json.dumps({"subscribed": self.symbols}))
+        if added:
+            await self.send_snapshot(added)
+
+    async def unsubscribe(self, symbols):
+        removed = [sym for sym in dict.fromkeys(symbols) if sym in self.symbols]
+        for sym in removed:
+            await self.channel_layer.group_discard(symbol_group(sym), self.channel_name)
+            self.symbols.remove(sym)
+            self.pending.pop(sym, None)
+        await release_symbols(self.channel_name, removed)
+        await self.send(text_data=json.dumps({"subscribed": self.symbols}))
+
+    async def send_snapshot(self, symbols=None):
+        # Full state: only sent on connect, on subscribe, or when the client asks for it
+        symbols = [s for s in symbols if s in self.symbols] if symbols else self.symbols
+        cached = await price_store.aget_many(symbols)
+        updates = [cached[sym].as_dict(sym) for sym in symbols if sym in cached]
+        await self.send_prices(updates, snapshot=True)
+
+    async def send_prices(self, updates, snapshot=False):
+        frame = self.encoder.encode(updates, snapshot=snapshot)
+        if self.encoder.binary:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
 
+    def _push_interval(self, requested):
+        """Seconds between pushes; clients may ask for a lower rate than the server max."""
+        max_rate = settings.PRICE_PUSH_MAX_RATE
         try:
-            async with websockets.connect(finnhub_url) as ws:
-                # Subscribe to symbols
-                for sym in self.symbols:
-                    await ws.send(json.dumps({"type": "subscribe", "symbol": sym}))
-                    print(await ws.recv())  # confirm subscription
-
-                while self.running:
-                    try:
-                        msg = await asyncio.wait_for(ws.recv(), timeout=5)
-                        data = json.loads(msg)
-
-                        if "data" in data and data["type"] == "trade":
-                            for trade in data["data"]:
-                                sym = trade["s"]
-                                price = float(trade["p"])
-                                ts = trade["t"]
-
-                                prev_price = self.prev_prices.get(sym, price)
-                                change = price - prev_price
-                                change_percent = (change / prev_price * 100) if prev_price != 0 else 0
-
-                                # update memory cache
-                                self.prev_prices[sym] = price
-
-                                update = {
-                                    "symbol": sym,
-                                    "latestPrice": price,
-                                    "change": change,
-                                    "changePercent": change_percent,
-                                    "timestamp": ts,
-                                }
-
-                                # store in Redis via Django cache
-                                cache.set(f"price:{sym}", update, timeout=86400)
-
-                            # build updates from cache
-                            updates = []
-                            for sym in self.symbols:
-                                cached = cache.get(f"price:{sym}")
-                                if cached:
-                                    updates.append(cached)
-
-                            await self.send(text_data=json.dumps({"prices": updates}))
-
-                    except asyncio.TimeoutError:
-                        # no live data → serve cached
-                        updates = []
-                        for sym in self.symbols:
-                            cached = cache.get(f"price:{sym}")
-                            print(cached,'----------------')
-                            if cached:
-                                updates.append(cached)
-                        if updates:
-                            await self.send(text_data=json.dumps({"prices": updates}))
-
-                    except Exception as e:
-                        await self.send(text_data=json.dumps({"error": str(e)}))
-                        break
-
-        except Exception as e:
-            await self.send(text_data=json.dumps({"error": f"WebSocket error: {str(e)}"}))
+            rate = float(requested) if requested else max_rate
+        except ValueError:
+            rate = max_rate
+        if max_rate > 0:
+            rate = min(rate, max_rate) if rate > 0 else max_rate
+        return 1.0 / rate if rate > 0 else 0.0
+
+    async def price_update(self, event):
+        # Deltas: only the symbols that ticked since the last push
+        for update in event["updates"]:
+            self.pending[update["symbol"]] = update
+        if self.flush_task is not None:
+            return  # a push is already scheduled; it will carry the latest values
+        delay = self.last_push + self.push_interval - time.monotonic()
+        if delay <= 0:
+            await self.flush_pending()
+        else:
+            self.flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush_pending()
+
+    async def flush_pending(self):
+        if not self.pending:
+            return
+        updates = list(self.pending.values())
+        self.pending = {}
+        self.last_push = time.monotonic()
+        await self.send_prices(updates)
+
+    async def price_status(self, event):
+        # Upstream state changes; while reconnecting, snapshots are served from the cache
+        status = {k: v for k, v in event.items() if k != "type"}
+        await self.send(text_data=json.dumps(status))
+        if event["status"] == "reconnecting":
+            self.upstream_down = True
+        elif event["status"] == "connected" and getattr(self, "upstream_down", False):
+            self.upstream_down = False
+            await self.send_snapshot()  # resync ticks missed during the outage
@@ -0,0 +1,39 @@
+"""Weak ETags for polled price and history endpoints.
+
+Views build the tag from what identifies their data (latest bar date, tick
+timestamps), check If-None-Match before serializing anything, and answer 304
+when the client already has it.
+"""
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+
+def weak_etag(*parts):
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def not_modified(request, etag):
+    """A 304 response if the request's If-None-Match matches ``etag`` (weak comparison), else None."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+    candidates = parse_etags(header)
+    if "*" in candidates or _strip_weak(etag) in {_strip_weak(c) for c in candidates}:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    # Pollers must revalidate every time; 304s keep that cheap
+    response["Cache-Control"] = "no-cache"
+    return response
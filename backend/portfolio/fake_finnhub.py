@@ -0,0 +1,143 @@
+"""Local stand-in for the Finnhub WebSocket and REST APIs.
+
+Used by ``manage.py fake_finnhub`` and ``manage.py loadtest_prices`` so the
+live price path can be exercised offline. Point FINNHUB_WS_URL /
+FINNHUB_API_URL at it (e.g. ws://127.0.0.1:8765 and http://127.0.0.1:8766/api/v1).
+
+Trades are either synthetic (a random walk per subscribed symbol at a fixed
+rate) or replayed from a JSONL file of recorded Finnhub messages or a
+TickRecorder day directory (TICK_RECORDER_DIR/YYYYMMDD). Trade
+timestamps (``t``) are stamped with the wall clock at send time so clients
+can measure tick-to-client latency.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import websockets
+
+from .tick_recorder import replay_messages
+
+
+class FakeFinnhub:
+    def __init__(self, rate=10.0, batch=1, replay=None, speed=1.0, seed=None):
+        self.rate = rate      # messages per second per subscribed symbol
+        self.batch = batch    # trades per message
+        self.replay = replay  # JSONL of recorded messages, or a TickRecorder day directory
+        self.speed = speed    # replay speed multiplier
+        self.random = random.Random(seed)
+        self.prices = {}
+        self.prev_closes = {}
+        self.clients = set()
+
+    def price(self, symbol):
+        # Random walk so quotes and trades for a symbol stay consistent
+        last = self.prices.get(symbol) or self.random.uniform(20, 500)
+        self.prices[symbol] = max(0.01, last * (1 + self.random.gauss(0, 0.0005)))
+        return self.prices[symbol]
+
+    def trade_message(self, symbols):
+        now_ms = int(time.time() * 1000)
+        data = [
+            {"s": sym, "p": round(self.price(sym), 4), "t": now_ms, "v": self.random.randint(1, 500), "c": None}
+            for sym in symbols
+            for _ in range(self.batch)
+        ]
+        return json.dumps({"type": "trade", "data": data})
+
+    async def handler(self, ws, path=None):
+        subscribed = set()
+        self.clients.add(ws)
+        producer = asyncio.create_task(
+            self.replay_to(ws, subscribed) if self.replay else self.synthesize_to(ws, subscribed)
+        )
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("type") == "subscribe":
+                    subscribed.add(msg["symbol"])
+                elif msg.get("type") == "unsubscribe":
+                    subscribed.discard(msg["symbol"])
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            producer.cancel()
+            self.clients.discard(ws)
+
+    async def synthesize_to(self, ws, subscribed):
+        interval = 1.0 / self.rate if self.rate > 0 else 1.0
+        while True:
+            await asyncio.sleep(interval)
+            if subscribed:
+                await ws.send(self.trade_message(sorted(subscribed)))
+            else:
+                await ws.send(json.dumps({"type": "ping"}))
+
+    async def replay_to(self, ws, subscribed):
+        while True:  # loop the recording
+            prev_t = None
+            for msg in self.recorded_messages():
+                if msg.get("type") != "trade" or not msg.get("data"):
+                    continue
+                trades = [t for t in msg["data"] if t["s"] in subscribed]
+                t = msg["data"][0]["t"]
+                if prev_t is not None and t > prev_t:
+                    await asyncio.sleep((t - prev_t) / 1000 / self.speed)
+                prev_t = t
+                if trades:
+                    now_ms = int(time.time() * 1000)
+                    for trade in trades:
+                        self.prices[trade["s"]] = float(trade["p"])
+                        trade["t"] = now_ms
+                    await ws.send(json.dumps({"type": "trade", "data": trades}))
+
+    def recorded_messages(self):
+        if os.path.isdir(self.replay):
+            yield from replay_messages(self.replay)
+            return
+        with open(self.replay) as fh:
+            for line in fh:
+                yield json.loads(line)
+
+    async def serve_ws(self, host="127.0.0.1", port=8765):
+        return await websockets.serve(self.handler, host, port)
+
+    def serve_http(self, host="127.0.0.1", port=8766):
+        """Start the REST stand-in (quote and search) in a daemon thread."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                params = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+                if url.path.endswith("/quote"):
+                    sym = params.get("symbol", "AAPL").upper()
+                    price = fake.price(sym)
+                    prev_close = fake.prev_closes.setdefault(sym, price)
+                    body = {"c": price, "pc": prev_close, "h": price, "l": price, "o": prev_close, "t": int(time.time())}
+                elif url.path.endswith("/search"):
+                    q = params.get("q", "").upper()
+                    body = {"count": 1, "result": [
+                        {"symbol": q, "displaySymbol": q, "description": f"{q} FAKE INC", "type": "Common Stock", "mic": "XNAS"}
+                    ]}
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
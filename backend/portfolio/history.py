@@ -0,0 +1,254 @@
+"""Daily OHLCV history from Alpha Vantage, stored in tiers.
+
+Shared by ``historical_prices`` (incremental sync on request), the
+``backfill_history`` command and the background backfill queued when a
+symbol is first added to a portfolio or watchlist, so a chart never has to
+pay for the initial load. Rows are written with one bulk upsert
+(INSERT ... ON CONFLICT (symbol, date) DO UPDATE) instead of a
+``get_or_create`` per day.
+
+Storage is tiered. HistoricalPrice keeps the last HISTORY_DAILY_DAYS daily
+bars; HistoricalRollup keeps weekly bars for HISTORY_WEEKLY_WEEKS and
+monthly bars for good. Rollups are recomputed for the periods touched by
+each write before old daily rows are pruned, so nothing is lost to
+retention. ``pick_tier`` serves a range from the coarsest tier that still
+gives the requested resolution. Daily writes are also merged into the
+column store (``portfolio.column_store``) when one is configured.
+"""
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from channels.db import database_sync_to_async
+from django.db import close_old_connections, transaction
+from django.db.models import Min, Subquery
+
+from .column_store import column_store
+from .http_clients import ahttp_get, http_get
+from .models import HistoricalPrice, HistoricalRollup
+from .ratelimit import BACKGROUND, INTERACTIVE, aacquire, acquire
+from .singleflight import single_flight
+from .trading_calendar import recent_trading_days
+
+ALPHAVANTAGE_URL = "https://www.alphavantage.co/query"
+COMPACT_DAYS = 100  # trading days in an outputsize=compact response
+UPSERT = {
+    "update_conflicts": True,
+    "unique_fields": ["symbol", "date"],
+    "update_fields": ["open", "high", "low", "close", "volume"],
+    "batch_size": 1000,
+}
+ROLLUP_UPSERT = {
+    "update_conflicts": True,
+    "unique_fields": ["symbol", "period", "date"],
+    "update_fields": ["open", "high", "low", "close", "volume", "days"],
+    "batch_size": 1000,
+}
+TIERS = {"1d": 1, "1w": 7, "1mo": 31}  # tier -> approximate days per bar, finest first
+
+_BACKFILL_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-backfill")
+
+
+class HistoryUnavailable(Exception):
+    """Alpha Vantage answered without a daily series (rate limit note, unknown symbol, ...)."""
+
+    def __init__(self, message, throttled=False):
+        super().__init__(message)
+        self.throttled = throttled
+
+
+def _params(symbol, outputsize):
+    return {
+        "function": "TIME_SERIES_DAILY",
+        "symbol": symbol,
+        "outputsize": outputsize,
+        "apikey": settings.ALPHAVANTAGE_API_KEY,
+    }
+
+
+def parse_daily(symbol, data):
+    """HistoricalPrice rows (unsaved, oldest first) from a TIME_SERIES_DAILY payload."""
+    series = data.get("Time Series (Daily)")
+    if not series:
+        # Throttling comes back as a 200 with a "Note"/"Information" message
+        throttled = "Note" in data or "Information" in data
+        reason = data.get("Note") or data.get("Information") or data.get("Error Message") or "no daily series"
+        raise HistoryUnavailable(f"{symbol}: {reason}", throttled=throttled)
+    rows = [
+        HistoricalPrice(
+            symbol=symbol,
+            date=datetime.strptime(date_str, "%Y-%m-%d").date(),
+            open=float(values["1. open"]),
+            high=float(values["2. high"]),
+            low=float(values["3. low"]),
+            close=float(values["4. close"]),
+            volume=int(values["5. volume"]),
+        )
+        for date_str, values in series.items()
+    ]
+    rows.sort(key=lambda row: row.date)
+    return rows
+
+
+def _get_daily(symbol, outputsize):
+    # Callers take the rate-limit token
+    r = http_get("alphavantage", ALPHAVANTAGE_URL, params=_params(symbol, outputsize))
+    r.raise_for_status()
+    return parse_daily(symbol, r.json())
+
+
+def fetch_daily(symbol, outputsize="compact", priority=BACKGROUND):
+    acquire("alphavantage", priority)
+    return _get_daily(symbol, outputsize)
+
+
+async def afetch_daily(symbol, outputsize="compact", priority=INTERACTIVE):
+    await aacquire("alphavantage", priority)
+    r = await ahttp_get("alphavantage", ALPHAVANTAGE_URL, params=_params(symbol, outputsize))
+    r.raise_for_status()
+    return parse_daily(symbol, r.json())
+
+
+def period_start(day, period):
+    """First calendar day of the week (Monday) or month containing ``day``."""
+    if period == "1w":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _rollups(symbol, period, rows):
+    bars = {}
+    for row in rows:
+        start = period_start(row.date, period)
+        bar = bars.get(start)
+        if bar is None:
+            bars[start] = HistoricalRollup(
+                symbol=symbol, period=period, date=start, open=row.open, high=row.high,
+                low=row.low, close=row.close, volume=row.volume, days=1,
+            )
+        else:
+            bar.high = max(bar.high, row.high)
+            bar.low = min(bar.low, row.low)
+            bar.close = row.close
+            bar.volume += row.volume
+            bar.days += 1
+    return list(bars.values())
+
+
+def roll_up(symbol, since):
+    """Recompute the weekly and monthly bars of every period containing a day >= ``since``."""
+    first = min(period_start(since, period) for period, _ in HistoricalRollup.PERIODS)
+    rows = list(HistoricalPrice.objects.filter(symbol=symbol, date__gte=first).order_by("date"))
+    if not rows:
+        return
+    oldest = HistoricalPrice.objects.filter(symbol=symbol).aggregate(oldest=Min("date"))["oldest"]
+    complete, partial = [], []
+    for period, _ in HistoricalRollup.PERIODS:
+        # Rows start at the earliest touched period of any kind, so e.g. the
+        # week before the touched month shows up with only some of its days;
+        # only periods containing a day >= ``since`` are recomputed
+        touched = period_start(since, period)
+        for bar in _rollups(symbol, period, rows):
+            if bar.date >= touched:
+                (complete if bar.date >= oldest else partial).append(bar)
+    HistoricalRollup.objects.bulk_create(complete, **ROLLUP_UPSERT)
+    # Periods that began before the oldest daily row we still hold were rolled
+    # up while their early days existed; recomputing them now would drop those
+    HistoricalRollup.objects.bulk_create(partial, ignore_conflicts=True)
+
+
+def _keep_newest(queryset, keep):
+    # One DELETE; the subquery is NULL while fewer than ``keep`` rows exist, so nothing matches
+    newest = queryset.order_by("-date").values("date")[keep - 1:keep]
+    deleted, _ = queryset.filter(date__lt=Subquery(newest)).delete()
+    return deleted
+
+
+def enforce_retention(symbol):
+    """Prune daily bars beyond HISTORY_DAILY_DAYS and weekly bars beyond HISTORY_WEEKLY_WEEKS."""
+    _keep_newest(HistoricalPrice.objects.filter(symbol=symbol), settings.HISTORY_DAILY_DAYS)
+    _keep_newest(HistoricalRollup.objects.filter(symbol=symbol, period="1w"), settings.HISTORY_WEEKLY_WEEKS)
+
+
+def store_daily(symbol, rows):
+    """Upsert daily rows, refresh their rollups and apply retention; returns rows written."""
+    if not rows:
+        return 0
+    with transaction.atomic():
+        HistoricalPrice.objects.bulk_create(rows, **UPSERT)
+        roll_up(symbol, min(row.date for row in rows))
+        enforce_retention(symbol)
+    store = column_store()
+    if store is not None:
+        store.merge(symbol, rows, settings.HISTORY_DAILY_DAYS)
+    return len(rows)
+
+
+astore_daily = database_sync_to_async(store_daily)
+
+
+def daily_window():
+    """Trading days an incremental (compact) sync is expected to keep filled."""
+    return recent_trading_days(min(settings.HISTORY_DAILY_DAYS, COMPACT_DAYS))
+
+
+def tier_start(tier):
+    """Oldest date a tier can serve under the current retention settings."""
+    today = date.today()
+    if tier == "1d":
+        return recent_trading_days(settings.HISTORY_DAILY_DAYS)[0]
+    if tier == "1w":
+        return period_start(today, "1w") - timedelta(weeks=settings.HISTORY_WEEKLY_WEEKS - 1)
+    return date.min
+
+
+def pick_tier(start, resolution="1d"):
+    """Coarsest tier no coarser than ``resolution`` that reaches back to ``start``.
+
+    An open ``start`` asks for the whole stored history. If no such tier holds
+    data that old, fall back to the finest coarser tier that does (monthly
+    always does).
+    """
+    oldest = date.min if start is None else start
+    covering = [tier for tier in TIERS if tier_start(tier) <= oldest]
+    fine_enough = [tier for tier in covering if TIERS[tier] <= TIERS[resolution]]
+    return fine_enough[-1] if fine_enough else covering[0]
+
+
+def tier_queryset(symbol, tier):
+    """Bars of ``symbol`` in ``tier``; every tier has ``date`` and OHLCV columns."""
+    if tier == "1d":
+        return HistoricalPrice.objects.filter(symbol=symbol)
+    return HistoricalRollup.objects.filter(symbol=symbol, period=tier)
+
+
+def backfill_symbol(symbol, outputsize="compact", priority=BACKGROUND):
+    """Fetch and store a symbol's daily history; returns rows written."""
+    return store_daily(symbol, fetch_daily(symbol, outputsize, priority))
+
+
+def _load_if_missing(symbol):
+    # A chart load may have stored the symbol while the backfill queued for its token
+    if HistoricalPrice.objects.filter(symbol=symbol).exists():
+        return 0
+    return store_daily(symbol, _get_daily(symbol, settings.ALPHAVANTAGE_OUTPUTSIZE))
+
+
+def _backfill_if_missing(symbol):
+    try:
+        if not HistoricalPrice.objects.filter(symbol=symbol).exists():
+            # The BACKGROUND bucket can queue for minutes, far past the lock's
+            # LOCK_TTL, so wait for the token first and hold the lock only for the call
+            acquire("alphavantage", BACKGROUND)
+            # Same key as historical_prices, so a chart opened meanwhile waits for this load
+            written = single_flight(f"history:{symbol}", lambda: _load_if_missing(symbol), wait=60)
+            print(f"[HISTORY] backfilled {written} days for {symbol}")
+    except Exception as e:
+        print(f"[HISTORY] background backfill failed for {symbol}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_backfill(symbol):
+    """Load history for a newly tracked symbol in the background."""
+    _BACKFILL_POOL.submit(_backfill_if_missing, symbol.upper())
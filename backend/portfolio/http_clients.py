@@ -0,0 +1,91 @@
+"""Shared keep-alive HTTP clients for outbound providers.
+
+Module-level ``requests.get`` opens a new TCP+TLS connection per call. Here
+every process keeps one ``requests.Session`` whose adapter pools connections
+per host, and one ``httpx.AsyncClient`` per event loop for async code. Each
+provider gets its own (connect, read) timeouts; callers can still pass
+``timeout=`` to override them.
+"""
+import threading
+import weakref
+import asyncio
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# provider -> (connect, read) timeout in seconds
+TIMEOUTS = {
+    "finnhub": (3.05, 10),
+    "alphavantage": (3.05, 15),
+    "openrouter": (5, 60),
+}
+POOL_HOSTS = 8        # distinct hosts kept in the sync pool
+POOL_MAXSIZE = 32     # connections kept alive per host
+KEEPALIVE_EXPIRY = 30
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+
+
+def session():
+    """Process-wide pooled ``requests.Session`` (safe to share between threads)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def http_get(provider, url, **kwargs):
+    kwargs.setdefault("timeout", TIMEOUTS[provider])
+    return session().get(url, **kwargs)
+
+
+def http_post(provider, url, **kwargs):
+    kwargs.setdefault("timeout", TIMEOUTS[provider])
+    return session().post(url, **kwargs)
+
+
+def async_client():
+    """Pooled ``httpx.AsyncClient`` for the running event loop.
+
+    httpx clients are tied to the loop they were first used on, so sync
+    views run through async_to_sync (a fresh loop each time) get their own.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=POOL_HOSTS * POOL_MAXSIZE,
+                max_keepalive_connections=POOL_MAXSIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _async_timeout(provider, kwargs):
+    timeout = kwargs.pop("timeout", TIMEOUTS[provider])
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        timeout = httpx.Timeout(read, connect=connect)
+    return timeout
+
+
+async def ahttp_get(provider, url, **kwargs):
+    timeout = _async_timeout(provider, kwargs)
+    return await async_client().get(url, timeout=timeout, **kwargs)
+
+
+async def ahttp_post(provider, url, **kwargs):
+    timeout = _async_timeout(provider, kwargs)
+    return await async_client().post(url, timeout=timeout, **kwargs)
@@ -0,0 +1,349 @@
+import re
+import json
+import time
+import random
+import asyncio
+import websockets
+from channels.consumer import AsyncConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from .bars import FLUSH_INTERVAL, BarAggregator
+from .price_store import PriceRecord, price_store
+from .tick_recorder import TickRecorder
+
+# Channel layer alias (settings.CHANNEL_LAYERS) carrying ticks and status to
+# LivePriceConsumer: process-local in-memory groups unless the worker is used
+PRICES_LAYER = "prices"
+# Group every LivePriceConsumer joins for ingestor-wide status (errors)
+PRICES_GROUP = "prices"
+# Channel the dedicated ingestion worker listens on (manage.py runworker price-ingestion)
+INGESTION_CHANNEL = "price-ingestion"
+# Keep the upstream socket open this long after the last symbol is released,
+# so watchlist churn does not turn into reconnects
+UPSTREAM_IDLE_TIMEOUT = 30
+# With the worker, consumers re-send their symbols this often so a restarted
+# worker (which starts with no subscriptions) picks them up again
+WORKER_REACQUIRE_INTERVAL = 30
+# The worker releases owners that have not re-acquired for this long: their
+# web process died or was redeployed without sending a release
+OWNER_TTL = 3 * WORKER_REACQUIRE_INTERVAL
+# Reconnect backoff (seconds): full jitter over base * 2**attempt, capped
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+# The worker's status for the health endpoint of every web process; refreshed
+# at most every HEALTH_INTERVAL. Per-process ingestors are reported from memory.
+HEALTH_KEY = "ingestion:health"
+HEALTH_INTERVAL = 5
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Jittered exponential backoff so reconnecting processes don't stampede upstream."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def symbol_group(symbol):
+    """Channel-layer group carrying ticks for a single symbol."""
+    # Group names only allow ASCII alphanumerics, hyphens, underscores and periods
+    return f"{PRICES_GROUP}.{re.sub(r'[^A-Za-z0-9_.-]', '_', symbol)}"
+
+
+class FinnhubIngestor:
+    """Single upstream Finnhub connection shared by every consumer in the process.
+
+    Consumers acquire/release symbols under an owner key (their channel name).
+    A symbol stays subscribed upstream while at least one owner holds it, and
+    every trade is fanned out to that symbol's group on the PRICES_LAYER.
+    """
+
+    def __init__(self, url=None):
+        self.url = url or f"{settings.FINNHUB_WS_URL}?token={settings.FINNHUB_API_KEY}"
+        self.owners = {}     # owner -> set of symbols held
+        self.refcounts = {}  # symbol -> number of owners holding it
+        self.seen = {}       # owner -> time.monotonic() of its last acquire
+        self.prev_prices = {}
+        self.ws = None
+        self._task = None
+        self._idle_close = None
+        self._expiry = None
+        self.health = {
+            "status": "idle",
+            "since": None,
+            "last_message_at": None,
+            "reconnects": 0,
+            "last_error": None,
+        }
+        self._health_written_at = 0.0
+        # Optional append-only trade log (see tick_recorder); disabled when unset
+        self.recorder = TickRecorder(settings.TICK_RECORDER_DIR) if settings.TICK_RECORDER_DIR else None
+        self.bars = BarAggregator()
+
+    async def acquire(self, owner, symbols):
+        self.seen[owner] = time.monotonic()
+        held = self.owners.setdefault(owner, set())
+        added = []
+        for sym in symbols:
+            if sym in held:
+                continue
+            held.add(sym)
+            count = self.refcounts.get(sym, 0)
+            self.refcounts[sym] = count + 1
+            if count == 0:
+                added.append(sym)
+        if self._idle_close is not None:
+            self._idle_close.cancel()
+            self._idle_close = None
+        self._ensure_running()
+        await self._send_subscriptions("subscribe", added)
+
+    async def release(self, owner, symbols=None):
+        held = self.owners.get(owner)
+        if not held:
+            self.owners.pop(owner, None)
+            self.seen.pop(owner, None)
+            return
+        targets = set(held) if symbols is None else held & set(symbols)
+        removed = []
+        for sym in targets:
+            held.discard(sym)
+            count = self.refcounts.get(sym, 0) - 1
+            if count <= 0:
+                self.refcounts.pop(sym, None)
+                removed.append(sym)
+            else:
+                self.refcounts[sym] = count
+        if not held:
+            self.owners.pop(owner, None)
+            self.seen.pop(owner, None)
+        await self._send_subscriptions("unsubscribe", removed)
+        self.bars.unwatch(removed)
+        if not self.refcounts and self._idle_close is None:
+            self._idle_close = asyncio.get_running_loop().call_later(
+                UPSTREAM_IDLE_TIMEOUT, self._close_if_idle
+            )
+
+    async def release_stale(self):
+        """Release every owner that has not acquired for OWNER_TTL; returns them."""
+        now = time.monotonic()
+        stale = [owner for owner, seen in self.seen.items() if now - seen > OWNER_TTL]
+        for owner in stale:
+            print(f"[INGEST] releasing {owner}: no re-acquire for {now - self.seen[owner]:.0f}s")
+            await self.release(owner)
+        return stale
+
+    def start_owner_expiry(self):
+        """Worker only: periodically drop owners whose web process has gone away."""
+        if self._expiry is None or self._expiry.done():
+            self._expiry = asyncio.get_running_loop().create_task(self._expire_owners())
+
+    async def _expire_owners(self):
+        while True:
+            await asyncio.sleep(WORKER_REACQUIRE_INTERVAL)
+            try:
+                await self.release_stale()
+            except Exception as e:
+                print(f"[INGEST] owner expiry failed: {e}")
+
+    def _close_if_idle(self):
+        # Nobody has been listening for UPSTREAM_IDLE_TIMEOUT; drop the upstream socket
+        self._idle_close = None
+        if not self.refcounts and self.ws is not None:
+            asyncio.get_running_loop().create_task(self.ws.close())
+
+    async def _send_subscriptions(self, action, symbols):
+        # Before the socket is open, run() subscribes to everything in refcounts
+        if self.ws is None:
+            return
+        try:
+            for sym in symbols:
+                await self.ws.send(json.dumps({"type": action, "symbol": sym}))
+        except websockets.ConnectionClosed:
+            return
+        if action == "subscribe":
+            self.bars.watch(symbols)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def handle_trades(self, trades):
+        """Collapse one trade message into the latest update per symbol."""
+        latest = {}
+        for trade in trades:
+            sym = trade["s"]
+            price = float(trade["p"])
+            prev_price = self.prev_prices.get(sym, price)
+            change = price - prev_price
+            change_percent = (change / prev_price * 100) if prev_price != 0 else 0
+            self.prev_prices[sym] = price
+            latest[sym] = {
+                "symbol": sym,
+                "latestPrice": price,
+                "change": change,
+                "changePercent": change_percent,
+                "timestamp": trade["t"],
+            }
+        return list(latest.values())
+
+    async def _set_health(self, status=None, **fields):
+        """Record ingestor state; per-message heartbeats are written at most every HEALTH_INTERVAL."""
+        now = time.time()
+        changed = status is not None and status != self.health["status"]
+        if changed:
+            self.health.update(status=status, since=now)
+        self.health.update(fields)
+        if not settings.PRICE_INGESTION_WORKER:
+            return  # ingestor_health() reads this process's ingestor directly
+        if not changed and set(fields) <= {"last_message_at"} and now - self._health_written_at < HEALTH_INTERVAL:
+            return
+        self.health["symbols"] = len(self.refcounts)
+        self._health_written_at = now
+        try:
+            await cache.aset(HEALTH_KEY, dict(self.health), timeout=None)
+        except Exception as e:
+            print(f"[INGEST] could not write health: {e}")
+
+    async def _broadcast_status(self, channel_layer, **payload):
+        await channel_layer.group_send(PRICES_GROUP, {"type": "price.status", **payload})
+
+    async def _flush_bars(self):
+        # On a timer rather than per message, so the last bars of a session
+        # close and get stored even though no further trades arrive
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.bars.flush()
+            except Exception as e:
+                print(f"[BARS] flush failed: {e}")
+
+    async def run(self):
+        """Supervised ingestion loop.
+
+        Reconnects with jittered exponential backoff and resubscribes to every
+        symbol still held. Consumers keep serving the cached snapshot while the
+        upstream is down and resync once it is back.
+        """
+        channel_layer = get_channel_layer(PRICES_LAYER)
+        while True:
+            bar_timer = asyncio.get_running_loop().create_task(self._flush_bars())
+            try:
+                await self._ingest(channel_layer)
+            finally:
+                bar_timer.cancel()
+                if self.recorder is not None:
+                    self.recorder.close()
+                self.bars.close_all()
+                try:
+                    await self.bars.flush()
+                except Exception as e:
+                    print(f"[BARS] final flush failed: {e}")
+            await self._set_health("idle")
+            # acquire() during the awaits above saw this task still running and
+            # left its symbols to it, so only stop once nobody holds anything
+            if not self.refcounts:
+                return
+
+    async def _ingest(self, channel_layer):
+        attempt = 0
+        while self.refcounts:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self.ws = ws
+                    await self._send_subscriptions("subscribe", list(self.refcounts))
+                    await self._set_health("connected", last_error=None)
+                    await self._broadcast_status(channel_layer, status="connected")
+                    async for msg in ws:
+                        attempt = 0  # only reset once upstream actually delivers
+                        data = json.loads(msg)
+                        await self._set_health(last_message_at=time.time())
+                        if data.get("type") != "trade" or "data" not in data:
+                            continue
+                        if self.recorder is not None:
+                            await self.recorder.record(data["data"])
+                        self.bars.add_trades(data["data"])
+                        updates = self.handle_trades(data["data"])
+                        # One pipelined Redis write per message instead of one SET per trade
+                        await price_store.aset_many({u["symbol"]: PriceRecord.from_update(u) for u in updates})
+                        for update in updates:
+                            await channel_layer.group_send(
+                                symbol_group(update["symbol"]),
+                                {"type": "price.update", "updates": [update]},
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[INGEST] upstream error: {e}")
+                await self._set_health(last_error=str(e))
+            finally:
+                self.ws = None
+                self.bars.unwatch()  # trades missed until the resubscribe make open bars partial
+
+            if not self.refcounts:
+                break  # closed because nobody is subscribed
+            delay = backoff_delay(attempt)
+            attempt += 1
+            self.health["reconnects"] += 1
+            await self._set_health("reconnecting")
+            await self._broadcast_status(
+                channel_layer, status="reconnecting", error=self.health["last_error"], retry_in=round(delay, 1)
+            )
+            await asyncio.sleep(delay)
+
+
+_ingestor = None
+
+
+def get_ingestor():
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = FinnhubIngestor()
+    return _ingestor
+
+
+def ingestor_health():
+    """Status of the ingestor feeding this process's sockets: the worker's, or the process's own."""
+    if settings.PRICE_INGESTION_WORKER:
+        health = cache.get(HEALTH_KEY)
+    else:
+        health = dict(_ingestor.health, symbols=len(_ingestor.refcounts)) if _ingestor is not None else None
+    # Nothing has needed an upstream connection yet (fresh deploy, no sockets)
+    return health or {"status": "idle", "since": None}
+
+
+async def acquire_symbols(owner, symbols):
+    """Register interest in symbols, in-process or via the ingestion worker."""
+    symbols = list(symbols)
+    if settings.PRICE_INGESTION_WORKER:
+        await get_channel_layer().send(
+            INGESTION_CHANNEL, {"type": "ingestion.acquire", "owner": owner, "symbols": symbols}
+        )
+    else:
+        await get_ingestor().acquire(owner, symbols)
+
+
+async def release_symbols(owner, symbols=None):
+    """Drop interest in symbols (all of the owner's symbols when None)."""
+    symbols = list(symbols) if symbols is not None else None
+    if settings.PRICE_INGESTION_WORKER:
+        await get_channel_layer().send(
+            INGESTION_CHANNEL, {"type": "ingestion.release", "owner": owner, "symbols": symbols}
+        )
+    else:
+        await get_ingestor().release(owner, symbols)
+
+
+class PriceIngestionWorker(AsyncConsumer):
+    """Channel worker that owns the upstream connection for all web processes."""
+
+    async def ingestion_acquire(self, message):
+        # Also the consumers' periodic re-acquire, which keeps the owner alive;
+        # symbols an owner already holds are skipped
+        ingestor = get_ingestor()
+        ingestor.start_owner_expiry()
+        await ingestor.acquire(message["owner"], message["symbols"])
+
+    async def ingestion_release(self, message):
+        ingestor = get_ingestor()
+        ingestor.start_owner_expiry()
+        await ingestor.release(message["owner"], message.get("symbols"))
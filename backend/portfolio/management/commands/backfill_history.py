@@ -0,0 +1,100 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from alerts.models import Alert
+from portfolio.history import HistoryUnavailable, backfill_symbol
+from portfolio.models import InterestedStock, Stock
+from portfolio.ratelimit import BACKGROUND
+
+DEFAULT_CHECKPOINT = ".backfill_history.json"
+
+
+def _tracked_symbols():
+    symbols = set()
+    for model in (Stock, InterestedStock, Alert):
+        symbols.update(s.upper() for s in model.objects.values_list("symbol", flat=True).distinct())
+    return sorted(symbols)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill HistoricalPrice from Alpha Vantage for the given symbols, or every symbol referenced "
+        "by Stock/InterestedStock/Alert. Runs concurrently under the shared rate limit, upserts in bulk "
+        "and records finished symbols in a checkpoint file so an interrupted run can resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("symbols", nargs="*", help="Symbols to backfill (default: all tracked symbols)")
+        parser.add_argument("--outputsize", choices=["compact", "full"], default="compact",
+                            help="compact = last 100 days, full = 20+ years")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--retries", type=int, default=3, help="Attempts per symbol on upstream errors")
+        parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **opts):
+        symbols = [s.upper() for s in opts["symbols"]] or _tracked_symbols()
+        if not symbols:
+            raise CommandError("No symbols given and none are referenced by Stock/InterestedStock/Alert")
+
+        checkpoint = opts["checkpoint"]
+        done = set()
+        if os.path.exists(checkpoint) and not opts["restart"]:
+            with open(checkpoint) as fh:
+                state = json.load(fh)
+            if state.get("outputsize") == opts["outputsize"]:
+                done = set(state.get("done", []))
+        todo = [s for s in symbols if s not in done]
+        self.stdout.write(f"{len(todo)} symbols to backfill ({len(symbols) - len(todo)} already done per checkpoint)")
+
+        failed = {}
+        written = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, opts["concurrency"])) as pool:
+            futures = {pool.submit(self._backfill, sym, opts): sym for sym in todo}
+            for future in as_completed(futures):
+                sym = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    failed[sym] = str(e)
+                    self.stderr.write(f"{sym}: {e}")
+                    continue
+                written += rows
+                done.add(sym)
+                self._save_checkpoint(checkpoint, opts["outputsize"], done)
+                self.stdout.write(f"{sym}: {rows} days ({len(done)}/{len(symbols)})")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Wrote {written} rows for {len(todo) - len(failed)} symbols in {elapsed:.1f}s")
+        if failed:
+            self.stdout.write(f"{len(failed)} failed; rerun to resume from {checkpoint}")
+        elif os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def _backfill(self, symbol, opts):
+        try:
+            for attempt in range(1, opts["retries"] + 1):
+                try:
+                    return backfill_symbol(symbol, opts["outputsize"], priority=BACKGROUND)
+                except HistoryUnavailable as e:
+                    # Only throttling is worth retrying; an unknown symbol won't improve
+                    if not e.throttled or attempt == opts["retries"]:
+                        raise
+                except Exception:
+                    if attempt == opts["retries"]:
+                        raise
+                time.sleep(2 ** attempt)
+        finally:
+            close_old_connections()
+
+    def _save_checkpoint(self, path, outputsize, done):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"outputsize": outputsize, "done": sorted(done)}, fh)
+        os.replace(tmp, path)
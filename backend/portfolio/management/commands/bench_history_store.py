@@ -0,0 +1,97 @@
+import time
+import random
+import shutil
+import tempfile
+import statistics
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from portfolio.column_store import HistoryColumnStore, to_dicts
+from portfolio.models import HistoricalPrice
+from portfolio.trading_calendar import recent_trading_days
+
+
+def _orm_read(symbol):
+    # What chart loads and the prompt builder used to do: one model instance, then one dict, per row
+    return [
+        {
+            "date": hp.date.isoformat(),
+            "open": hp.open,
+            "high": hp.high,
+            "low": hp.low,
+            "close": hp.close,
+            "volume": hp.volume,
+        }
+        for hp in HistoricalPrice.objects.filter(symbol=symbol).order_by("date")
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Read latency of a symbol's full daily history from HistoricalPrice through the ORM "
+        "against the memory-mapped column store (as arrays, and converted to API dicts). "
+        "Uses the configured DB; writes throwaway BENCH rows and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--years", default="1,5,20", help="Comma-separated history lengths in years")
+        parser.add_argument("--requests", type=int, default=50, help="Timed reads per length")
+        parser.add_argument("--dir", default=None, help="Column store directory (default: a temporary one)")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        years = [int(y) for y in opts["years"].split(",") if y.strip()]
+        rng = random.Random(opts["seed"])
+        root = opts["dir"] or tempfile.mkdtemp(prefix="bench-history-")
+        store = HistoryColumnStore(root)
+        try:
+            self._run(store, years, rng, opts["requests"])
+        finally:
+            if not opts["dir"]:
+                shutil.rmtree(root, ignore_errors=True)
+
+    def _run(self, store, years, rng, requests):
+        self.stdout.write(
+            f"{'years':>5} {'bars':>6} {'ORM p50':>10} {'p95':>9} "
+            f"{'arrays p50':>11} {'p95':>9} {'dicts p50':>10} {'p95':>9}"
+        )
+        for n_years in years:
+            symbol = f"BENCH{n_years}Y"
+            days = recent_trading_days(252 * n_years, end=date.today())
+            price = 100.0
+            rows = []
+            for day in days:
+                price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+                rows.append(HistoricalPrice(
+                    symbol=symbol, date=day, open=price, high=price * 1.01,
+                    low=price * 0.99, close=price, volume=rng.randint(10**5, 10**7),
+                ))
+            HistoricalPrice.objects.filter(symbol=symbol).delete()
+            HistoricalPrice.objects.bulk_create(rows, batch_size=1000)
+            try:
+                orm = self._time(lambda: _orm_read(symbol), requests)
+                arrays = self._time(lambda: store.load(symbol), requests)
+                dicts = self._time(lambda: to_dicts(store.load(symbol)), requests)
+                self.stdout.write(
+                    f"{n_years:>5} {len(rows):>6} {self._ms(orm, 50):>10} {self._ms(orm, 95):>9} "
+                    f"{self._ms(arrays, 50):>11} {self._ms(arrays, 95):>9} "
+                    f"{self._ms(dicts, 50):>10} {self._ms(dicts, 95):>9}"
+                )
+            finally:
+                HistoricalPrice.objects.filter(symbol=symbol).delete()
+                store.drop(symbol)
+
+    def _time(self, fn, n):
+        fn()  # warm connections and build the column files
+        samples = []
+        for _ in range(n):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _ms(self, samples, pct):
+        if pct == 50:
+            return f"{statistics.median(samples):.3f} ms"
+        return f"{statistics.quantiles(samples, n=100)[pct - 1]:.3f} ms"
@@ -0,0 +1,76 @@
+import time
+import random
+import statistics
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from portfolio.models import InterestedStock
+from portfolio.price_store import PriceRecord, price_store
+from portfolio.views import watchlist_snapshot
+from portfolio.watchlists import invalidate_watchlist
+
+
+def _per_symbol_read(user):
+    # What user_interested_prices used to do: query the watchlist, then one cache read per symbol
+    symbols = list(InterestedStock.objects.filter(user=user).values_list("symbol", flat=True))
+    return [cache.get(price_store.key(sym)) for sym in symbols]
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-request latency of watchlist/snapshot/ against watchlist size, compared with "
+        "the old query-plus-one-cache-read-per-symbol path. Uses the configured DB and cache; "
+        "creates a throwaway user and removes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="5,20,50,100,250", help="Comma-separated watchlist sizes")
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per size")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        rng = random.Random(opts["seed"])
+        factory = APIRequestFactory()
+        User = get_user_model()
+        user = User.objects.create_user(username=f"bench-watchlist-{rng.randrange(10**9)}", password=None)
+        self.stdout.write(f"{'size':>6} {'snapshot p50':>13} {'p95':>9} {'per-symbol p50':>15} {'p95':>9}")
+        try:
+            for size in sizes:
+                InterestedStock.objects.filter(user=user).delete()
+                symbols = [f"BENCH{i:04d}" for i in range(size)]
+                InterestedStock.objects.bulk_create(InterestedStock(user=user, symbol=s) for s in symbols)
+                invalidate_watchlist(user.id)
+                price_store.set_many({s: PriceRecord(rng.uniform(10, 500), 0.0, 0.0) for s in symbols})
+
+                def snapshot():
+                    request = factory.get("/api/watchlist/snapshot/")
+                    force_authenticate(request, user=user)
+                    return watchlist_snapshot(request)
+
+                snap = self._time(snapshot, opts["requests"])
+                old = self._time(lambda: _per_symbol_read(user), opts["requests"])
+                self.stdout.write(
+                    f"{size:>6} {self._ms(snap, 50):>13} {self._ms(snap, 95):>9} "
+                    f"{self._ms(old, 50):>15} {self._ms(old, 95):>9}"
+                )
+        finally:
+            invalidate_watchlist(user.id)
+            user.delete()
+
+    def _time(self, fn, n):
+        fn()  # warm the watchlist cache and connections
+        samples = []
+        for _ in range(n):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _ms(self, samples, pct):
+        if pct == 50:
+            return f"{statistics.median(samples):.2f} ms"
+        return f"{statistics.quantiles(samples, n=100)[pct - 1]:.2f} ms"
@@ -0,0 +1,33 @@
+import asyncio
+from django.core.management.base import BaseCommand
+
+from portfolio.fake_finnhub import FakeFinnhub
+
+
+class Command(BaseCommand):
+    help = "Run a local Finnhub stand-in (WebSocket trades + REST quote/search) for offline testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--ws-port", type=int, default=8765)
+        parser.add_argument("--http-port", type=int, default=8766)
+        parser.add_argument("--rate", type=float, default=10.0, help="Trade messages per second per connection")
+        parser.add_argument("--batch", type=int, default=1, help="Trades per symbol in each message")
+        parser.add_argument("--replay", help="JSONL file of recorded Finnhub messages, or a tick recorder day directory, to replay instead of synthetic trades")
+        parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        fake = FakeFinnhub(
+            rate=opts["rate"], batch=opts["batch"], replay=opts["replay"], speed=opts["speed"], seed=opts["seed"]
+        )
+        fake.serve_http(opts["host"], opts["http_port"])
+        self.stdout.write(
+            f"Fake Finnhub on ws://{opts['host']}:{opts['ws_port']} and http://{opts['host']}:{opts['http_port']}/api/v1\n"
+            f"Set FINNHUB_WS_URL and FINNHUB_API_URL to these to use it."
+        )
+        asyncio.run(self._serve(fake, opts["host"], opts["ws_port"]))
+
+    async def _serve(self, fake, host, port):
+        await fake.serve_ws(host, port)
+        await asyncio.Future()  # run until interrupted
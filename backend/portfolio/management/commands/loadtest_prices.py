@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import random
+import asyncio
+import resource
+
+import websockets
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from portfolio.fake_finnhub import FakeFinnhub
+
+DEFAULT_SYMBOLS = "AAPL,MSFT,TSLA,AMZN,GOOGL,NVDA,META,NFLX,AMD,INTC,ORCL,IBM,CRM,ADBE,PYPL,UBER"
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _ms(value):
+    return "n/a" if value is None else f"{value:.1f} ms"
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = int(round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+
+class _CommunicatorClient:
+    """In-process client driving the consumer through the ASGI app."""
+
+    def __init__(self, app, path):
+        self.comm = WebsocketCommunicator(app, path)
+
+    async def connect(self):
+        connected, _ = await self.comm.connect(timeout=10)
+        if not connected:
+            raise RuntimeError("consumer refused the connection")
+
+    async def send(self, text):
+        await self.comm.send_to(text_data=text)
+
+    async def recv(self, timeout):
+        return await self.comm.receive_from(timeout=timeout)
+
+    async def close(self):
+        await self.comm.disconnect()
+
+
+class _NetworkClient:
+    """Client for a running server (daphne/uvicorn) reached over TCP."""
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_queue=None)
+
+    async def send(self, text):
+        await self.ws.send(text)
+
+    async def recv(self, timeout):
+        return await asyncio.wait_for(self.ws.recv(), timeout)
+
+    async def close(self):
+        await self.ws.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many ws/prices/ clients against a local Finnhub stand-in and report "
+        "tick-to-client latency percentiles, messages/sec and memory per connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds to measure after all clients connect")
+        parser.add_argument("--symbols", default=DEFAULT_SYMBOLS, help="Comma-separated symbol universe")
+        parser.add_argument("--symbols-per-client", type=int, default=5)
+        parser.add_argument("--rate", type=float, default=10.0, help="Fake Finnhub messages/sec")
+        parser.add_argument("--max-rate", type=float, default=4.0, help="Per-client push rate (?max_rate=)")
+        parser.add_argument("--layer", choices=["memory", "redis"], default="memory",
+                            help="Channel layer/cache for in-process runs: InMemoryChannelLayer+locmem or settings (Redis)")
+        parser.add_argument("--fake-port", type=int, default=8765)
+        parser.add_argument("--url", help="ws:// URL of a running server; the fake must then be started separately")
+        parser.add_argument("--connect-concurrency", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def _overrides(self, opts):
+        """Settings for in-process runs (none when driving a running server)."""
+        if opts["url"]:
+            return {}
+        overrides = {
+            "FINNHUB_WS_URL": f"ws://127.0.0.1:{opts['fake_port']}",
+            "PRICE_INGESTION_WORKER": False,
+            "PRICE_PUSH_MAX_RATE": opts["max_rate"],
+        }
+        if opts["layer"] == "memory":
+            # Consumers and the ingestor talk over the "prices" alias (see settings.CHANNEL_LAYERS)
+            layer = {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"capacity": 1000}}
+            overrides["CHANNEL_LAYERS"] = {"default": layer, "prices": layer}
+            overrides["CACHES"] = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        return overrides
+
+    def handle(self, *args, **opts):
+        with override_settings(**self._overrides(opts)):
+            report = asyncio.run(self.run(opts))
+        for line in report:
+            self.stdout.write(line)
+
+    def _make_client(self, opts):
+        query = f"max_rate={opts['max_rate']}"
+        if opts["url"]:
+            return _NetworkClient(f"{opts['url']}?{query}")
+        from portfolio.routing import websocket_urlpatterns
+        if not hasattr(self, "_app"):
+            self._app = URLRouter(websocket_urlpatterns)
+        return _CommunicatorClient(self._app, f"/ws/prices/?{query}")
+
+    async def run(self, opts):
+        rng = random.Random(opts["seed"])
+        universe = [s.strip().upper() for s in opts["symbols"].split(",") if s.strip()]
+        per_client = min(opts["symbols_per_client"], len(universe))
+
+        server = None
+        if not opts["url"]:
+            fake = FakeFinnhub(rate=opts["rate"], seed=opts["seed"])
+            server = await fake.serve_ws("127.0.0.1", opts["fake_port"])
+
+        rss_before = _rss_bytes()
+        clients = [self._make_client(opts) for _ in range(opts["clients"])]
+        sem = asyncio.Semaphore(opts["connect_concurrency"])
+        connect_started = time.monotonic()
+
+        async def connect(client):
+            async with sem:
+                await client.connect()
+                await client.send(json.dumps({"action": "subscribe", "symbols": rng.sample(universe, per_client)}))
+
+        results = await asyncio.gather(*(connect(c) for c in clients), return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        clients = [c for c, r in zip(clients, results) if not isinstance(r, Exception)]
+        connect_secs = time.monotonic() - connect_started
+        rss_after = _rss_bytes()
+
+        latencies = []
+        counters = {"messages": 0, "bytes": 0}
+        stop_at = time.monotonic() + opts["duration"]
+
+        async def consume(client):
+            while True:
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    frame = await client.recv(timeout=remaining)
+                except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                    return
+                now_ms = time.time() * 1000
+                counters["messages"] += 1
+                counters["bytes"] += len(frame)
+                msg = json.loads(frame)
+                if msg.get("snapshot"):
+                    continue
+                for update in msg.get("prices", []):
+                    if update.get("timestamp"):
+                        latencies.append(now_ms - update["timestamp"])
+
+        started = time.monotonic()
+        await asyncio.gather(*(consume(c) for c in clients))
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+        if server is not None:
+            server.close()
+
+        latencies.sort()
+        n = len(clients) or 1
+        mode = f"remote {opts['url']}" if opts["url"] else f"in-process ({opts['layer']} layer)"
+        return [
+            f"mode: {mode}",
+            f"clients: {len(clients)} connected, {failed} failed, in {connect_secs:.1f}s",
+            f"messages: {counters['messages']} ({counters['messages'] / elapsed:.0f}/s), "
+            f"{counters['bytes'] / elapsed / 1024:.0f} KiB/s",
+            f"tick-to-client latency: p50 {_ms(_percentile(latencies, 50))}, p90 {_ms(_percentile(latencies, 90))}, "
+            f"p99 {_ms(_percentile(latencies, 99))}, max {_ms(latencies[-1] if latencies else None)} "
+            f"over {len(latencies)} ticks",
+            f"memory per connection: {(rss_after - rss_before) / n / 1024:.1f} KiB"
+            + (" (harness process only)" if opts["url"] else ""),
+        ]
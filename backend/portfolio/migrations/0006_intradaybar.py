@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_alter_interestedstock_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntradayBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20)),
+                ('interval', models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('15m', '15 minutes')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.FloatField()),
+            ],
+            options={
+                'ordering': ['start'],
+                'unique_together': {('symbol', 'interval', 'start')},
+            },
+        ),
+    ]
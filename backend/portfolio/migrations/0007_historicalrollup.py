@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_intradaybar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20)),
+                ('period', models.CharField(choices=[('1w', 'Weekly'), ('1mo', 'Monthly')], max_length=4)),
+                ('date', models.DateField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.BigIntegerField()),
+                ('days', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('symbol', 'period', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+from portfolio.history import period_start
+
+
+def backfill_rollups(apps, schema_editor):
+    # Daily rows stored before HistoricalRollup existed were never rolled up;
+    # writes since then only recompute the periods they touch
+    HistoricalPrice = apps.get_model("portfolio", "HistoricalPrice")
+    HistoricalRollup = apps.get_model("portfolio", "HistoricalRollup")
+    symbols = HistoricalPrice.objects.values_list("symbol", flat=True).distinct()
+    for symbol in list(symbols):
+        bars = {}
+        for row in HistoricalPrice.objects.filter(symbol=symbol).order_by("date").iterator():
+            for period in ("1w", "1mo"):
+                key = (period, period_start(row.date, period))
+                bar = bars.get(key)
+                if bar is None:
+                    bars[key] = HistoricalRollup(
+                        symbol=symbol, period=period, date=key[1], open=row.open, high=row.high,
+                        low=row.low, close=row.close, volume=row.volume, days=1,
+                    )
+                else:
+                    bar.high = max(bar.high, row.high)
+                    bar.low = min(bar.low, row.low)
+                    bar.close = row.close
+                    bar.volume += row.volume
+                    bar.days += 1
+        # Bars already written by roll_up saw the same daily rows
+        HistoricalRollup.objects.bulk_create(bars.values(), batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_historicalrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
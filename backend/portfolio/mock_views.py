@@ -3,14 +3,26 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 import random
 from datetime import datetime, timedelta
-import requests
+from .http_clients import http_get
 from django.conf import settings 
 from django.core.cache import cache
 import time
 from django.http import JsonResponse
 from rest_framework.permissions import AllowAny
 
-from .models import HistoricalPrice
+from .models import HistoricalPrice, IntradayBar
+from .bars import INTERVALS, SESSION_BARS, live_bar_key
+from .singleflight import asingle_flight
+from . import aio_cache
+from .ratelimit import RateLimited, acquire
+from .history import TIERS, HistoryUnavailable, afetch_daily, astore_daily, daily_window, period_start, pick_tier, tier_queryset
+from .trading_calendar import last_completed_session
+from .column_store import COLUMNS, load_history, to_columns, to_dicts
+from .downsample import lttb
+from channels.db import database_sync_to_async
+from .views import require_GET_async
+from .etags import not_modified, weak_etag, with_etag
+from django.db.models import Count, Max
 
 
 @api_view(['GET'])
@@ -29,8 +41,13 @@ def mock_prices(request):
 
     prices = []
     for symbol in symbols:
+        try:
+            acquire("alphavantage")
+        except RateLimited as e:
+            prices.append({'symbol': symbol, 'error': str(e)})
+            continue
         url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={settings.ALPHAVANTAGE_API_KEY}"
-        response = requests.get(url)
+        response = http_get("alphavantage", url)
         data = response.json()
 
         if "Global Quote" in data and data["Global Quote"]:
@@ -50,7 +67,9 @@ def mock_prices(request):
                 'error': 'Data not available'
             })
 
-    cache.set("stock_prices", prices, timeout=60)
+    # Don't cache rate-limit or error payloads
+    if not any('error' in p for p in prices):
+        cache.set("stock_prices", prices, timeout=60)
     return Response({
         'prices': prices,
         'last_updated': datetime.now().isoformat(),
@@ -138,125 +157,179 @@ def mock_prices(request):
 
 
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def historical_prices(request):
-    symbol = request.GET.get("symbol", "AAPL").upper()
-    range_param = request.GET.get("range", "1M")
+# How long a sync that came back without the last completed session (not
+# published yet, halted, delisted or unknown symbol) holds off the next one
+SYNC_RECHECK_INTERVAL = 15 * 60
 
-    # Always keep 100 days in DB
-    MAX_DAYS = 100  
 
-    qs = HistoricalPrice.objects.filter(symbol=symbol).order_by("date")
+def _checked_key(symbol):
+    """Cache key holding the session the last sync for ``symbol`` asked upstream for."""
+    return f"history:{symbol}:checked"
 
-    if qs.exists():
-        print("Data from DB")
 
-        latest_date_in_db = qs.last().date
-        today = datetime.today().date()
+async def _missing_rows(symbol):
+    # Every trading day a compact response covers that we should have but don't,
+    # including holes left by earlier failed syncs
+    window = daily_window()
+    stored = {
+        d async for d in HistoricalPrice.objects.filter(symbol=symbol, date__gte=window[0]).values_list("date", flat=True)
+    }
+    missing = set(window) - stored
+    if not missing:
+        return []
 
-        if latest_date_in_db < today:
-            # Fetch the most recent day from Alpha Vantage
-            url = (
-                f"https://www.alphavantage.co/query"
-                f"?function=TIME_SERIES_DAILY"
-                f"&symbol={symbol}"
-                f"&outputsize=compact"
-                f"&apikey={settings.ALPHAVANTAGE_API_KEY}"
-            )
-            r = requests.get(url, timeout=15)
-            data = r.json()
-
-            if "Time Series (Daily)" in data:
-                time_series = data["Time Series (Daily)"]
-
-                # Find the most recent trading day from API
-                latest_date_str = max(time_series.keys())
-                values = time_series[latest_date_str]
-                date_obj = datetime.strptime(latest_date_str, "%Y-%m-%d").date()
-
-                if date_obj > latest_date_in_db:
-                    # Insert the new day
-                    HistoricalPrice.objects.create(
-                        symbol=symbol,
-                        date=date_obj,
-                        open=float(values["1. open"]),
-                        high=float(values["2. high"]),
-                        low=float(values["3. low"]),
-                        close=float(values["4. close"]),
-                        volume=int(values["5. volume"]),
-                    )
-
-                    # --- Delete only the oldest record if count > 100 ---
-                    count = HistoricalPrice.objects.filter(symbol=symbol).count()
-                    if count > MAX_DAYS:
-                        oldest = (
-                            HistoricalPrice.objects.filter(symbol=symbol)
-                            .order_by("date")
-                            .first()
-                        )
-                        if oldest:
-                            oldest.delete()
-
-        # Refresh queryset
-        qs = HistoricalPrice.objects.filter(symbol=symbol).order_by("date")
+    rows = await afetch_daily(symbol)
+    new_rows = [row for row in rows if row.date in missing]
+    if len(new_rows) < len(missing):
+        print(f"[HISTORY] {symbol}: upstream has {len(new_rows)} of {len(missing)} missing days")
+    return new_rows
 
-    else:
-        print("Data from API (initial load)")
-        url = (
-            f"https://www.alphavantage.co/query"
-            f"?function=TIME_SERIES_DAILY"
-            f"&symbol={symbol}"
-            f"&outputsize=compact"
-            f"&apikey={settings.ALPHAVANTAGE_API_KEY}"
-        )
-        r = requests.get(url, timeout=15)
-        data = r.json()
-
-        if "Time Series (Daily)" not in data:
-            return JsonResponse({"prices": {symbol: []}, "error": "No data"}, status=200)
-
-        time_series = data["Time Series (Daily)"]
-
-        # Insert up to 100 days (most recent first)
-        for date_str, values in list(time_series.items())[:MAX_DAYS]:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-            HistoricalPrice.objects.get_or_create(
-                symbol=symbol,
-                date=date_obj,
-                defaults={
-                    "open": float(values["1. open"]),
-                    "high": float(values["2. high"]),
-                    "low": float(values["3. low"]),
-                    "close": float(values["4. close"]),
-                    "volume": int(values["5. volume"]),
-                },
+
+async def _sync_daily_history(symbol, latest_date_in_db):
+    """Pull missing daily candles from Alpha Vantage into the DB; returns rows added."""
+    session = last_completed_session()
+    try:
+        if latest_date_in_db is None:
+            # Initial load, stored in one bulk upsert and rolled up into weekly/monthly bars
+            rows = await afetch_daily(symbol, settings.ALPHAVANTAGE_OUTPUTSIZE)
+        else:
+            rows = await _missing_rows(symbol)
+    except HistoryUnavailable as e:
+        if not e.throttled:
+            await aio_cache.aset(_checked_key(symbol), session, timeout=SYNC_RECHECK_INTERVAL)
+        raise
+    if not any(row.date == session for row in rows):
+        # Chart loads until the recheck read what is stored instead of calling upstream again
+        await aio_cache.aset(_checked_key(symbol), session, timeout=SYNC_RECHECK_INTERVAL)
+    return await astore_daily(symbol, rows)
+
+
+# Calendar days covered by each chart range; YTD starts on January 1 and
+# anything else (e.g. ALL) returns the whole stored history, which only the
+# monthly tier reaches back to
+RANGE_DAYS = {"1M": 30, "3M": 91, "6M": 182, "1Y": 365, "5Y": 1826}
+
+
+def _range_bounds(params):
+    """(start, end) dates for ?from=&to= (YYYY-MM-DD, either optional) or ?range=."""
+    today = datetime.today().date()
+    if "from" in params or "to" in params:
+        start = datetime.strptime(params["from"], "%Y-%m-%d").date() if params.get("from") else None
+        end = datetime.strptime(params["to"], "%Y-%m-%d").date() if params.get("to") else None
+        return start, end
+    range_param = params.get("range", "1M")
+    if range_param == "YTD":
+        return today.replace(month=1, day=1), None
+    if range_param in RANGE_DAYS:
+        return today - timedelta(days=RANGE_DAYS[range_param]), None
+    return None, None
+
+
+@require_GET_async
+async def historical_prices(request):
+    symbol = request.GET.get("symbol", "AAPL").upper()
+    try:
+        start, end = _range_bounds(request.GET)
+    except ValueError:
+        return JsonResponse({"error": "from and to must be dates as YYYY-MM-DD"}, status=400)
+    # Bar size the chart wants: 1d (default), 1w or 1mo
+    resolution = request.GET.get("interval", "1d")
+    if resolution not in TIERS:
+        resolution = "1d"
+    # Cap on candles returned; longer series are thinned with LTTB
+    try:
+        max_points = max(3, int(request.GET["max_points"])) if "max_points" in request.GET else None
+    except ValueError:
+        max_points = None
+
+    latest = await HistoricalPrice.objects.filter(symbol=symbol).order_by("date").alast()
+    print("Data from DB" if latest else "Data from API (initial load)")
+
+    session = last_completed_session()
+    if (latest is None or latest.date < session) and await aio_cache.aget(_checked_key(symbol)) != session:
+        # Only one worker per symbol talks to Alpha Vantage; the others wait
+        # for it to finish and then read what it stored
+        try:
+            await asingle_flight(
+                f"history:{symbol}",
+                lambda: _sync_daily_history(symbol, latest.date if latest else None),
+                wait=20,
             )
+        except Exception as e:
+            print(f"[HISTORY] sync failed for {symbol}: {e}")
+
+    stored = await HistoricalPrice.objects.filter(symbol=symbol).aaggregate(latest=Max("date"), count=Count("id"))
+    if latest is None and not stored["count"]:
+        return JsonResponse({"prices": {symbol: []}, "error": "No data"}, status=200)
+
+    # Serve from the coarsest tier that still gives the requested bar size
+    tier = pick_tier(start, resolution)
+
+    # Every tier is rewritten whenever a daily bar lands, so the daily table identifies them all.
+    # Relative ranges move with the calendar, so the resolved window is part of the tag too
+    etag = weak_etag(
+        "history", symbol, sorted(request.GET.items()), start, end, tier, stored["latest"], stored["count"]
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    if tier == "1d":
+        # Daily bars come as array slices from the column store when one is configured
+        bars = await database_sync_to_async(load_history)(symbol, start, end)
+    else:
+        qs = tier_queryset(symbol, tier).order_by("date")
+        if start is not None:
+            qs = qs.filter(date__gte=period_start(start, tier))
+        if end is not None:
+            qs = qs.filter(date__lte=end)
+        bars = to_columns([row async for row in qs.values_list(*COLUMNS)])
+    if max_points is not None:
+        bars = lttb(bars, max_points)
+    candles = to_dicts(bars)
 
-        qs = HistoricalPrice.objects.filter(symbol=symbol).order_by("date")
+    return with_etag(JsonResponse({"prices": {symbol: candles}, "interval": tier}), etag)
 
-    # Build response candles
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def intraday_bars(request):
+    """Intraday OHLCV bars built from the live trade stream (no upstream API calls).
+
+    ?symbol=AAPL&interval=1m|5m|15m&limit=390
+    """
+    from datetime import timezone as dt_timezone
+
+    symbol = request.GET.get("symbol", "AAPL").upper()
+    interval = request.GET.get("interval", "1m")
+    if interval not in INTERVALS:
+        return JsonResponse({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get("limit", SESSION_BARS)), 5000))
+    except ValueError:
+        limit = SESSION_BARS
+
+    rows = list(
+        IntradayBar.objects.filter(symbol=symbol, interval=interval)
+        .order_by("-start")
+        .values_list("start", "open", "high", "low", "close", "volume")[:limit]
+    )
+    rows.reverse()
     candles = [
-        {
-            "date": hp.date.strftime("%Y-%m-%d"),
-            "open": hp.open,
-            "high": hp.high,
-            "low": hp.low,
-            "close": hp.close,
-            "volume": hp.volume,
-        }
-        for hp in qs
+        {"date": start.isoformat(), "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for start, o, h, l, c, v in rows
     ]
 
-    # Range filter for frontend (but DB always has 100)
-    if range_param == "1M":
-        candles = candles[-30:]
-    elif range_param == "3M":
-        candles = candles[-90:]
-    elif range_param == "6M":
-        candles = candles[-180:]
-
-    return JsonResponse({"prices": {symbol: candles}})
+    # Bars not in the table yet (the open one, and any whose write is being
+    # retried) live in the cache; they replace stored rows with the same start
+    live = cache.get(live_bar_key(symbol, interval)) or []
+    if live:
+        by_date = {candle["date"]: candle for candle in candles}
+        for bar in live:
+            live_date = datetime.fromtimestamp(bar["start"], tz=dt_timezone.utc).isoformat()
+            by_date[live_date] = {"date": live_date, **{k: bar[k] for k in ("open", "high", "low", "close", "volume")}}
+        candles = [by_date[d] for d in sorted(by_date)][-limit:]
+
+    return JsonResponse({"prices": {symbol: candles}, "interval": interval})
 
 
 
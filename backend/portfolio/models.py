@@ -72,6 +72,55 @@ class HistoricalPrice(models.Model):
         return f"{self.symbol} - {self.date}"
 
 
+class HistoricalRollup(models.Model):
+    """Weekly/monthly OHLCV bars kept after the daily rows they summarize are pruned."""
+    PERIODS = [
+        ("1w", "Weekly"),
+        ("1mo", "Monthly"),
+    ]
+
+    symbol = models.CharField(max_length=20)
+    period = models.CharField(max_length=4, choices=PERIODS)
+    date = models.DateField()  # first calendar day of the week/month
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField()
+    days = models.PositiveSmallIntegerField()  # trading days rolled into the bar
+
+    class Meta:
+        unique_together = ("symbol", "period", "date")
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.period} - {self.date}"
+
+
+class IntradayBar(models.Model):
+    INTERVALS = [
+        ("1m", "1 minute"),
+        ("5m", "5 minutes"),
+        ("15m", "15 minutes"),
+    ]
+
+    symbol = models.CharField(max_length=20)
+    interval = models.CharField(max_length=4, choices=INTERVALS)
+    start = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.FloatField()
+
+    class Meta:
+        unique_together = ("symbol", "interval", "start")
+        ordering = ["start"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.interval} - {self.start}"
+
+
 class InterestedStock(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="interested_stocks")
     symbol = models.CharField(max_length=20)
@@ -0,0 +1,277 @@
+"""Single home for cached latest prices.
+
+Every price is stored under ``px:{SYMBOL}`` as a fixed-schema tuple
+``(price, change, change_percent, timestamp, fetched_at)``, so readers never
+have to sniff between floats and dicts. TTLs depend only on where the price
+came from:
+
+- LIVE_TTL for ticks from the Finnhub stream
+- STALE_TTL for REST quotes fetched on demand. They are fresh for QUOTE_TTL
+  and after that are still served (stale-while-revalidate) while
+  ``portfolio.quotes`` refreshes them in the background.
+
+The sync methods go through Django's cache. The async ones, used on the tick
+hot path and by the async views, talk to Redis directly (``aio_cache``) with
+pipelined writes and a single MGET. They reuse RedisCache's key prefixing and
+serializer, so both sides see the same entries.
+
+Reads can also go through an optional in-process L1: a small LRU with a
+TTL of about a second, sized by PRICE_L1_SIZE (0 turns it off). Every write
+publishes the touched symbols on INVALIDATE_CHANNEL, and each process
+listening there evicts them from its L1. If that listener loses Redis it
+clears its L1, so a missed invalidation is never served for longer than the
+TTL.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+from . import aio_cache
+from .aio_cache import redis_location
+
+LIVE_TTL = 86400  # live ticks stay readable for a day
+QUOTE_TTL = 300   # REST quotes are fresh for five minutes...
+STALE_TTL = 3600  # ...and may be served stale for up to an hour while refreshing
+
+INVALIDATE_CHANNEL = "px:invalidate"
+
+
+
+class PriceRecord(NamedTuple):
+    price: Optional[float]
+    change: Optional[float] = None
+    change_percent: Optional[float] = None
+    timestamp: Optional[int] = None
+    fetched_at: Optional[float] = None  # set for REST quotes; stream ticks never go stale
+
+    @classmethod
+    def from_update(cls, update):
+        """Build a record from the API/stream dict shape."""
+        return cls(update.get("latestPrice"), update.get("change"), update.get("changePercent"), update.get("timestamp"))
+
+    def age(self):
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+    def is_stale(self, max_age=QUOTE_TTL):
+        age = self.age()
+        return age is not None and age > max_age
+
+    def as_dict(self, symbol):
+        return {
+            "symbol": symbol,
+            "latestPrice": self.price,
+            "change": self.change,
+            "changePercent": self.change_percent,
+            "timestamp": self.timestamp,
+        }
+
+
+def empty_price(symbol, error=None):
+    """API dict for a symbol with no known price."""
+    result = PriceRecord(None).as_dict(symbol)
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+class LocalLRU:
+    """Bounded, thread-safe LRU whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self.entries.move_to_end(key)
+                    found[key] = entry[1]
+                elif entry is not None:
+                    del self.entries[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        expires = time.monotonic() + self.ttl
+        with self.lock:
+            for key, value in items.items():
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class PriceStore:
+    prefix = "px:"
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self._sync_client = None
+        self._l1 = None
+        self._listener = None
+        self._l1_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, symbol):
+        return f"{self.prefix}{symbol}"
+
+    def _sync_redis(self):
+        if self._sync_client is None:
+            self._sync_client = redis.Redis.from_url(redis_location())
+        return self._sync_client
+
+    # --- L1 (in-process) ---
+
+    def l1(self):
+        """The process-local LRU, or None when PRICE_L1_SIZE is 0."""
+        if settings.PRICE_L1_SIZE <= 0:
+            return None
+        if self._l1 is None:
+            with self._l1_lock:
+                if self._l1 is None:
+                    self._l1 = LocalLRU(settings.PRICE_L1_SIZE, settings.PRICE_L1_TTL)
+                    if isinstance(self.backend, RedisCache):
+                        self._listener = threading.Thread(
+                            target=self._listen_for_invalidations, name="px-invalidate", daemon=True
+                        )
+                        self._listener.start()
+        return self._l1
+
+    def l1_stats(self):
+        l1 = self.l1()
+        return l1.stats() if l1 is not None else {"enabled": False}
+
+    def _listen_for_invalidations(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self._sync_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                delay = 1
+                for message in pubsub.listen():
+                    symbols = message["data"].decode().split(",")
+                    self._l1.discard(symbols)
+            except Exception as e:
+                print(f"[PRICE L1] invalidation listener lost Redis, retrying in {delay}s: {e}")
+            # Invalidations may have been missed while disconnected
+            self._l1.clear()
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _invalidate_local(self, symbols):
+        if self._l1 is not None:
+            self._l1.discard(symbols)
+
+    # --- sync API (views, alert checks) ---
+
+    def get(self, symbol):
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols):
+        """Return {symbol: PriceRecord} for the symbols that have a cached price."""
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        l1 = self.l1()
+        result = l1.get_many(symbols) if l1 is not None else {}
+        misses = [s for s in symbols if s not in result]
+        if misses:
+            found = self.backend.get_many([self.key(s) for s in misses])
+            fetched = {s: PriceRecord(*found[self.key(s)]) for s in misses if self.key(s) in found}
+            if l1 is not None and fetched:
+                l1.set_many(fetched)
+            result.update(fetched)
+        return result
+
+    def _stamped(self, records):
+        now = time.time()
+        return {s: r if r.fetched_at else r._replace(fetched_at=now) for s, r in records.items()}
+
+    def set_many(self, records, ttl=STALE_TTL):
+        """Store fetched quotes ({symbol: PriceRecord}) in one round-trip, stamped with the fetch time."""
+        if not records:
+            return
+        backend = self.backend
+        backend.set_many({self.key(s): tuple(r) for s, r in self._stamped(records).items()}, timeout=ttl)
+        self._invalidate_local(records)
+        if isinstance(backend, RedisCache):
+            self._sync_redis().publish(INVALIDATE_CHANNEL, ",".join(records))
+
+    # --- async API (ingestion, WebSocket consumers, async views) ---
+
+    async def aget_many(self, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        l1 = self.l1()
+        result = l1.get_many(symbols) if l1 is not None else {}
+        misses = [s for s in symbols if s not in result]
+        if misses:
+            found = await aio_cache.aget_many([self.key(s) for s in misses])
+            fetched = {s: PriceRecord(*found[self.key(s)]) for s in misses if self.key(s) in found}
+            if l1 is not None and fetched:
+                l1.set_many(fetched)
+            result.update(fetched)
+        return result
+
+    async def aset_many(self, records, ttl=LIVE_TTL):
+        """Store {symbol: PriceRecord} with one pipelined write."""
+        if not records:
+            return
+        self._invalidate_local(records)
+        client = aio_cache.client()
+        if client is None:
+            await self.backend.aset_many({self.key(s): tuple(r) for s, r in records.items()}, timeout=ttl)
+            return
+        pipe = client.pipeline(transaction=False)
+        for sym, record in records.items():
+            pipe.set(aio_cache.make_key(self.key(sym)), aio_cache.serializer.dumps(tuple(record)), ex=ttl)
+        # Tell every process's L1 to drop these symbols
+        pipe.publish(INVALIDATE_CHANNEL, ",".join(records))
+        await pipe.execute()
+
+    async def aset_quotes(self, records):
+        """Async counterpart of set_many for REST quotes."""
+        await self.aset_many(self._stamped(records), ttl=STALE_TTL)
+
+
+price_store = PriceStore()
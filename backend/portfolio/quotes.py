@@ -0,0 +1,182 @@
+"""Finnhub REST quotes shared by the price views and alert checks.
+
+Cached quotes are served stale-while-revalidate: ``read_quotes`` returns
+whatever the price store has and schedules a background refresh for entries
+older than QUOTE_TTL instead of blocking the request on Finnhub. A per-process
+hot-symbol tracker also refreshes the most requested symbols shortly before
+they go stale, so popular keys rarely get that far.
+
+The ``a``-prefixed functions are the asyncio versions used by the async views.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .http_clients import ahttp_get, http_get
+from .price_store import QUOTE_TTL, PriceRecord, price_store
+from .ratelimit import BACKGROUND, INTERACTIVE, aacquire, acquire
+from .singleflight import asingle_flight, single_flight
+
+REFRESH_AHEAD = 60       # hot symbols are refreshed this many seconds before going stale
+HOT_REFRESH_INTERVAL = 15
+HOT_HALF_LIFE = 600      # request counts halve every ten minutes
+HOT_MAX_TRACKED = 2000
+
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+
+
+def _quote_url(sym):
+    return f"{settings.FINNHUB_API_URL}/quote?symbol={sym}&token={settings.FINNHUB_API_KEY}"
+
+
+def _parse_quote(sym, data):
+    price = data.get("c")
+    prev_price = data.get("pc")
+    change = price - prev_price if price is not None and prev_price is not None else None
+    change_percent = (change / prev_price * 100) if (change is not None and prev_price) else None
+    return {
+        "symbol": sym,
+        "latestPrice": price,
+        "change": change,
+        "changePercent": change_percent,
+        "timestamp": None,
+    }
+
+
+def fetch_finnhub_quote(sym, priority=INTERACTIVE, max_wait=None):
+    acquire("finnhub", priority, max_wait)
+    r = http_get("finnhub", _quote_url(sym))
+    # Don't let a 429 or error body turn into a cached empty quote
+    r.raise_for_status()
+    return _parse_quote(sym, r.json())
+
+
+async def afetch_finnhub_quote(sym, priority=INTERACTIVE, max_wait=None):
+    await aacquire("finnhub", priority, max_wait)
+    r = await ahttp_get("finnhub", _quote_url(sym))
+    r.raise_for_status()
+    return _parse_quote(sym, r.json())
+
+
+def get_quote(sym, wait=10, priority=INTERACTIVE):
+    """Quote for ``sym``, coalesced so concurrent misses make one upstream call.
+
+    ``wait`` bounds both the wait for another worker's fetch and for a
+    Finnhub rate-limit token.
+    """
+    return single_flight(f"quote:{sym}", lambda: fetch_finnhub_quote(sym, priority, wait), wait=wait)
+
+
+async def aget_quote(sym, wait=10, priority=INTERACTIVE):
+    return await asingle_flight(f"quote:{sym}", lambda: afetch_finnhub_quote(sym, priority, wait), wait=wait)
+
+
+class HotSymbols:
+    """Exponentially decayed request counts per symbol."""
+
+    def __init__(self, half_life=HOT_HALF_LIFE, max_tracked=HOT_MAX_TRACKED):
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self.scores = {}  # symbol -> (score, last update)
+        self.lock = threading.Lock()
+
+    def _decayed(self, score, since, now):
+        return score * 0.5 ** ((now - since) / self.half_life)
+
+    def touch(self, symbols):
+        now = time.monotonic()
+        with self.lock:
+            for sym in symbols:
+                score, since = self.scores.get(sym, (0.0, now))
+                self.scores[sym] = (self._decayed(score, since, now) + 1, now)
+            if len(self.scores) > self.max_tracked:
+                keep = self._ranked(now)[: self.max_tracked // 2]
+                self.scores = {sym: self.scores[sym] for sym in keep}
+
+    def _ranked(self, now):
+        return sorted(self.scores, key=lambda s: self._decayed(*self.scores[s], now), reverse=True)
+
+    def top(self, n):
+        with self.lock:
+            return self._ranked(time.monotonic())[:n]
+
+
+hot_symbols = HotSymbols()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresher = None
+
+
+def _refresh(sym):
+    try:
+        quote = get_quote(sym, wait=20, priority=BACKGROUND)
+        if quote.get("latestPrice") is not None:
+            price_store.set_many({sym: PriceRecord.from_update(quote)})
+    except Exception as e:
+        print(f"[QUOTES] background refresh failed for {sym}: {e}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(sym)
+
+
+def schedule_refresh(symbols):
+    """Refresh quotes in the background, skipping symbols already in flight here."""
+    with _refreshing_lock:
+        symbols = [s for s in symbols if s not in _refreshing]
+        _refreshing.update(symbols)
+    for sym in symbols:
+        _REFRESH_POOL.submit(_refresh, sym)
+
+
+def _refresh_hot_symbols():
+    while True:
+        time.sleep(HOT_REFRESH_INTERVAL)
+        try:
+            top = hot_symbols.top(settings.HOT_SYMBOL_COUNT)
+            records = price_store.get_many(top)
+            due = [
+                sym for sym in top
+                if sym not in records or records[sym].is_stale(QUOTE_TTL - REFRESH_AHEAD)
+            ]
+            if due:
+                schedule_refresh(due)
+        except Exception as e:
+            print(f"[QUOTES] hot symbol refresh failed: {e}")
+
+
+def _ensure_refresher():
+    global _refresher
+    if _refresher is None and settings.HOT_SYMBOL_COUNT > 0:
+        with _refreshing_lock:
+            if _refresher is None:
+                _refresher = threading.Thread(target=_refresh_hot_symbols, name="hot-quotes", daemon=True)
+                _refresher.start()
+
+
+def read_quotes(symbols):
+    """Cached {symbol: PriceRecord} for ``symbols``, stale ones included.
+
+    Stale entries are refreshed in the background; misses are left to the
+    caller. Every call counts towards the hot-symbol ranking.
+    """
+    hot_symbols.touch(symbols)
+    _ensure_refresher()
+    records = price_store.get_many(symbols)
+    stale = [sym for sym, record in records.items() if record.is_stale()]
+    if stale:
+        schedule_refresh(stale)
+    return records
+
+
+async def aread_quotes(symbols):
+    """Async read_quotes; background refreshes still run on the refresh pool."""
+    symbols = list(symbols)
+    hot_symbols.touch(symbols)
+    _ensure_refresher()
+    records = await price_store.aget_many(symbols)
+    stale = [sym for sym, record in records.items() if record.is_stale()]
+    if stale:
+        schedule_refresh(stale)
+    return records
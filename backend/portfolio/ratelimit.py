@@ -0,0 +1,236 @@
+"""Token-bucket rate limiting for upstream APIs, shared by every process.
+
+Each provider has one bucket in Redis, updated atomically by a Lua script
+that uses the Redis server clock, so every web worker, the ingestion worker
+and management commands all draw from the same budget. Callers say how
+urgent they are:
+
+- ``interactive`` (a user is waiting) may drain the bucket, but gives up with
+  RateLimited after a short wait rather than hanging the request.
+- ``background`` (refreshes, backfills) leaves a reserve of tokens for
+  interactive callers and waits as long as it takes.
+
+Throttling is counted per provider and priority (calls, throttled calls,
+rejections, total wait) and exposed through ``limiter_metrics``.
+"""
+import time
+import asyncio
+import threading
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+from . import aio_cache
+from .aio_cache import redis_location
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BACKGROUND_RESERVE = 0.2  # share of the bucket background callers may not touch
+INTERACTIVE_MAX_WAIT = 5  # seconds
+
+_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - 1 >= floor then
+    tokens = tokens - 1
+else
+    wait = (floor + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RateLimited(Exception):
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} rate limit reached, retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def _limits():
+    # provider -> requests per minute; the bucket holds one minute's worth
+    return {
+        "finnhub": settings.FINNHUB_RATE_LIMIT,
+        "alphavantage": settings.ALPHAVANTAGE_RATE_LIMIT,
+    }
+
+
+class _LocalBuckets:
+    """Same algorithm in process memory, for non-Redis caches (dev, load tests)."""
+
+    def __init__(self):
+        self.state = {}
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, floor):
+        with self.lock:
+            now = time.monotonic()
+            tokens, ts = self.state.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0, now - ts) * rate)
+            wait = 0.0
+            if tokens - 1 >= floor:
+                tokens -= 1
+            else:
+                wait = (floor + 1 - tokens) / rate
+            self.state[key] = (tokens, now)
+            return wait
+
+    def count(self, key, fields):
+        with self.lock:
+            counters = self.metrics.setdefault(key, {})
+            for field, value in fields.items():
+                counters[field] = counters.get(field, 0) + value
+
+    def read(self, key):
+        with self.lock:
+            return dict(self.metrics.get(key, {}))
+
+
+class RateLimiter:
+    prefix = "ratelimit:"
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self._client = None
+        self._script = None
+        self._local = _LocalBuckets()
+
+    def _redis(self):
+        if not isinstance(caches[self.alias], RedisCache):
+            return None
+        if self._client is None:
+            self._client = redis.Redis.from_url(redis_location())
+            self._script = self._client.register_script(_TAKE)
+        return self._client
+
+    def _take(self, provider, capacity, rate, floor):
+        key = f"{self.prefix}{provider}:bucket"
+        if self._redis() is None:
+            return self._local.take(key, capacity, rate, floor)
+        return float(self._script(keys=[key], args=[capacity, rate, floor]))
+
+    async def _atake(self, provider, capacity, rate, floor):
+        key = f"{self.prefix}{provider}:bucket"
+        client = aio_cache.client()
+        if client is None:
+            return self._local.take(key, capacity, rate, floor)
+        return float(await client.register_script(_TAKE)(keys=[key], args=[capacity, rate, floor]))
+
+    def _increments(self, pipe, key, fields):
+        for field, value in fields.items():
+            if isinstance(value, float):
+                pipe.hincrbyfloat(key, field, value)
+            else:
+                pipe.hincrby(key, field, value)
+
+    def _count(self, provider, priority, fields):
+        key = f"{self.prefix}{provider}:{priority}:metrics"
+        client = self._redis()
+        if client is None:
+            self._local.count(key, fields)
+            return
+        pipe = client.pipeline(transaction=False)
+        self._increments(pipe, key, fields)
+        pipe.execute()
+
+    async def _acount(self, provider, priority, fields):
+        key = f"{self.prefix}{provider}:{priority}:metrics"
+        client = aio_cache.client()
+        if client is None:
+            self._local.count(key, fields)
+            return
+        pipe = client.pipeline(transaction=False)
+        self._increments(pipe, key, fields)
+        await pipe.execute()
+
+    def _bucket(self, provider, priority, max_wait):
+        """(capacity, refill rate per second, reserve floor, max wait) for a call."""
+        capacity = max(1, _limits()[provider])
+        floor = capacity * BACKGROUND_RESERVE if priority == BACKGROUND else 0
+        if max_wait is None and priority == INTERACTIVE:
+            max_wait = INTERACTIVE_MAX_WAIT
+        return capacity, capacity / 60.0, floor, max_wait
+
+    def acquire(self, provider, priority=INTERACTIVE, max_wait=None):
+        """Block until ``provider`` has a token for this priority.
+
+        Raises RateLimited if that would take longer than ``max_wait``
+        (INTERACTIVE_MAX_WAIT for interactive callers, unbounded otherwise).
+        """
+        capacity, rate, floor, max_wait = self._bucket(provider, priority, max_wait)
+        waited = 0.0
+        while True:
+            wait = self._take(provider, capacity, rate, floor)
+            if wait <= 0:
+                break
+            if max_wait is not None and waited + wait > max_wait:
+                self._count(provider, priority, {"calls": 1, "rejected": 1, "wait_seconds": waited})
+                raise RateLimited(provider, wait)
+            time.sleep(wait)
+            waited += wait
+        self._count(provider, priority, {"calls": 1, "throttled": int(waited > 0), "wait_seconds": waited})
+        return waited
+
+    async def aacquire(self, provider, priority=INTERACTIVE, max_wait=None):
+        """Async acquire; waits on the event loop instead of blocking a thread."""
+        capacity, rate, floor, max_wait = self._bucket(provider, priority, max_wait)
+        waited = 0.0
+        while True:
+            wait = await self._atake(provider, capacity, rate, floor)
+            if wait <= 0:
+                break
+            if max_wait is not None and waited + wait > max_wait:
+                await self._acount(provider, priority, {"calls": 1, "rejected": 1, "wait_seconds": waited})
+                raise RateLimited(provider, wait)
+            await asyncio.sleep(wait)
+            waited += wait
+        await self._acount(provider, priority, {"calls": 1, "throttled": int(waited > 0), "wait_seconds": waited})
+        return waited
+
+    def metrics(self):
+        out = {}
+        client = self._redis()
+        for provider in _limits():
+            for priority in (INTERACTIVE, BACKGROUND):
+                key = f"{self.prefix}{provider}:{priority}:metrics"
+                if client is None:
+                    raw = self._local.read(key)
+                else:
+                    raw = {k.decode(): float(v) for k, v in client.hgetall(key).items()}
+                calls = int(raw.get("calls", 0))
+                out.setdefault(provider, {})[priority] = {
+                    "calls": calls,
+                    "throttled": int(raw.get("throttled", 0)),
+                    "rejected": int(raw.get("rejected", 0)),
+                    "wait_seconds": round(raw.get("wait_seconds", 0.0), 3),
+                    "avg_wait_ms": round(raw.get("wait_seconds", 0.0) / calls * 1000, 1) if calls else 0.0,
+                }
+        return out
+
+
+limiter = RateLimiter()
+
+
+def acquire(provider, priority=INTERACTIVE, max_wait=None):
+    return limiter.acquire(provider, priority, max_wait)
+
+
+async def aacquire(provider, priority=INTERACTIVE, max_wait=None):
+    return await limiter.aacquire(provider, priority, max_wait)
+
+
+def limiter_metrics():
+    return limiter.metrics()
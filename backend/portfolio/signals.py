@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .history import schedule_backfill
+from .models import InterestedStock, Stock
+from .watchlists import invalidate_watchlist
+
+
+@receiver(post_save, sender=InterestedStock)
+@receiver(post_delete, sender=InterestedStock)
+def drop_cached_watchlist(sender, instance, **kwargs):
+    invalidate_watchlist(instance.user_id)
+
+
+@receiver(post_save, sender=InterestedStock)
+@receiver(post_save, sender=Stock)
+def backfill_new_symbol(sender, instance, created, **kwargs):
+    # Load daily history before anyone opens the chart
+    if created:
+        transaction.on_commit(lambda: schedule_backfill(instance.symbol))
@@ -0,0 +1,108 @@
+"""Cross-process single-flight for upstream fetches.
+
+When many workers miss the cache for the same symbol at once, only one of
+them should call Finnhub/AlphaVantage. ``single_flight(key, fetch)`` takes a
+short lock with ``cache.add`` (atomic SET NX on Redis); the winner runs
+``fetch`` and publishes the outcome under a result key, everyone else polls
+that key until it appears. A leader that dies simply lets its lock expire and
+the next waiter takes over.
+
+Failures are published too, so a rate-limited upstream is not hit again by
+every waiter in turn.
+
+``asingle_flight`` is the asyncio version for async views. It uses the same
+keys, so sync and async callers coalesce with each other.
+"""
+import time
+import uuid
+import asyncio
+
+from django.core.cache import cache
+
+from . import aio_cache
+
+LOCK_TTL = 30     # longest a leader may hold the lock (covers the upstream timeout)
+RESULT_TTL = 5    # how long late arrivals can reuse a finished flight
+POLL_MIN = 0.02
+POLL_MAX = 0.25
+
+
+class SingleFlightError(Exception):
+    """The shared fetch failed, or no result arrived before the wait ran out."""
+
+
+def _keys(key):
+    return f"sf:{key}:lock", f"sf:{key}:result"
+
+
+def single_flight(key, fetch, wait=10, result_ttl=RESULT_TTL, lock_ttl=LOCK_TTL):
+    """Return ``fetch()``, running it at most once at a time per ``key`` across processes.
+
+    Raises SingleFlightError if the leader's fetch failed or nothing arrived
+    within ``wait`` seconds.
+    """
+    lock_key, result_key = _keys(key)
+    deadline = time.monotonic() + wait
+    delay = POLL_MIN
+    while True:
+        outcome = cache.get(result_key)
+        if outcome is not None:
+            ok, value = outcome
+            if ok:
+                return value
+            raise SingleFlightError(value)
+
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, timeout=lock_ttl):
+            try:
+                value = fetch()
+            except Exception as e:
+                cache.set(result_key, (False, str(e)), timeout=result_ttl)
+                raise
+            else:
+                cache.set(result_key, (True, value), timeout=result_ttl)
+                return value
+            finally:
+                # Only release our own lock; it may have expired and been retaken
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SingleFlightError(f"Timed out waiting for {key}")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, POLL_MAX)
+
+
+async def asingle_flight(key, fetch, wait=10, result_ttl=RESULT_TTL, lock_ttl=LOCK_TTL):
+    """Async single_flight; ``fetch`` is a coroutine function."""
+    lock_key, result_key = _keys(key)
+    deadline = time.monotonic() + wait
+    delay = POLL_MIN
+    while True:
+        outcome = await aio_cache.aget(result_key)
+        if outcome is not None:
+            ok, value = outcome
+            if ok:
+                return value
+            raise SingleFlightError(value)
+
+        token = uuid.uuid4().hex
+        if await aio_cache.aadd(lock_key, token, timeout=lock_ttl):
+            try:
+                value = await fetch()
+            except Exception as e:
+                await aio_cache.aset(result_key, (False, str(e)), timeout=result_ttl)
+                raise
+            else:
+                await aio_cache.aset(result_key, (True, value), timeout=result_ttl)
+                return value
+            finally:
+                if await aio_cache.aget(lock_key) == token:
+                    await aio_cache.adelete(lock_key)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SingleFlightError(f"Timed out waiting for {key}")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, POLL_MAX)
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from django.test import TestCase
+
+from portfolio.bars import BarAggregator, _upsert_bars
+from portfolio.models import IntradayBar
+
+T0 = 1_700_000_040  # start of a 1m window (divisible by 60)
+
+
+def _trade(secs, price, volume=1):
+    return {"s": "AAPL", "p": price, "t": secs * 1000, "v": volume}
+
+
+class BarAggregatorTests(TestCase):
+    def setUp(self):
+        self.agg = BarAggregator(intervals={"1m": 60})
+
+    def test_bars_from_before_the_watch_are_partial(self):
+        self.agg.watch(["AAPL"], now=T0 + 10)
+        self.agg.add_trades([_trade(T0 + 20, 10.0), _trade(T0 + 70, 11.0)])
+        self.agg.roll(now=T0 + 120)
+        (_, first), (_, second) = self.agg.unflushed
+        self.assertTrue(first["partial"])
+        self.assertFalse(second["partial"])
+        self.assertEqual((second["open"], second["close"]), (11.0, 11.0))
+
+    def test_unwatch_marks_open_bars_partial(self):
+        self.agg.watch(["AAPL"], now=T0)
+        self.agg.add_trades([_trade(T0 + 5, 10.0)])
+        self.agg.unwatch(["AAPL"])
+        self.assertTrue(self.agg.open_bars[("AAPL", "1m")]["partial"])
+
+    def test_roll_closes_bars_without_further_trades(self):
+        self.agg.watch(["AAPL"], now=T0)
+        self.agg.add_trades([_trade(T0 + 5, 10.0), _trade(T0 + 30, 12.0, volume=3)])
+        self.agg.roll(now=T0 + 59)
+        self.assertEqual(self.agg.unflushed, [])
+        self.agg.roll(now=T0 + 60)
+        (_, bar), = self.agg.unflushed
+        self.assertEqual((bar["high"], bar["low"], bar["volume"]), (12.0, 10.0, 4.0))
+
+    def test_partial_bar_never_overwrites_a_full_one(self):
+        full = {"start": T0, "open": 1.0, "high": 5.0, "low": 1.0, "close": 4.0, "volume": 100.0, "partial": False}
+        partial = dict(full, open=4.0, high=4.5, volume=10.0, partial=True)
+        _upsert_bars([(("AAPL", "1m"), full)])
+        _upsert_bars([(("AAPL", "1m"), partial)])
+        row = IntradayBar.objects.get(symbol="AAPL", interval="1m", start=datetime.fromtimestamp(T0, tz=timezone.utc))
+        self.assertEqual((row.high, row.volume), (5.0, 100.0))
+        # ...but fills a gap where nothing was stored
+        _upsert_bars([(("AAPL", "1m"), dict(partial, start=T0 + 60))])
+        self.assertEqual(IntradayBar.objects.filter(symbol="AAPL").count(), 2)
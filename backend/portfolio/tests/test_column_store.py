@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase
+
+from portfolio.column_store import HistoryColumnStore, _file_lock
+from portfolio.models import HistoricalPrice
+from portfolio.trading_calendar import trading_days
+
+
+def _rows(days, close=10.0):
+    return [
+        HistoricalPrice(symbol="TEST", date=day, open=close, high=close, low=close, close=close, volume=1)
+        for day in days
+    ]
+
+
+class HistoryColumnStoreTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="column-store-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.days = trading_days(date(2026, 9, 1), date(2026, 10, 16))
+        HistoricalPrice.objects.bulk_create(_rows(self.days[:-2]))
+
+    def _dates(self, bars):
+        return [d.item() for d in bars["date"]]
+
+    def test_processes_merge_one_at_a_time(self):
+        # Two stores on one directory stand in for two web processes
+        first, second = HistoryColumnStore(self.root), HistoryColumnStore(self.root)
+        first.load("TEST")
+        lock = os.path.join(self.root, "TEST", "LOCK")
+        with _file_lock(lock):
+            writer = threading.Thread(target=second.merge, args=("TEST", _rows(self.days[-2:-1]), 1000))
+            writer.start()
+            writer.join(0.2)
+            self.assertTrue(writer.is_alive())  # waits for the other process
+        writer.join()
+        first.merge("TEST", _rows(self.days[-1:]), 1000)
+        self.assertEqual(self._dates(second.load("TEST")), self.days)
+        # Only the live version is left on disk
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "TEST"))), sorted(["CURRENT", "LOCK", first._current("TEST")]))
+
+    def test_unreadable_version_falls_back_to_the_table(self):
+        HistoryColumnStore(self.root).load("TEST")
+        store = HistoryColumnStore(self.root)
+        with open(os.path.join(self.root, "TEST", store._current("TEST"), "close.npy"), "wb") as fh:
+            fh.write(b"truncated")
+        bars = store.load("TEST", start=self.days[5])
+        self.assertEqual(self._dates(bars), self.days[5:-2])
+
+    def test_failed_merge_rebuilds_from_the_table(self):
+        store = HistoryColumnStore(self.root)
+        store.load("TEST")
+        HistoricalPrice.objects.bulk_create(_rows(self.days[-2:]))
+        with mock.patch("portfolio.column_store.np.save", side_effect=OSError("disk full")):
+            store.merge("TEST", _rows(self.days[-2:]), 1000)
+        self.assertEqual(self._dates(store.load("TEST")), self.days)
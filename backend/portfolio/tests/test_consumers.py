@@ -0,0 +1,66 @@
+import json
+import asyncio
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+
+from portfolio.consumers import LivePriceConsumer
+
+IN_MEMORY_LAYER = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+    "prices": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class LivePriceConsumerTests(TransactionTestCase):
+    def setUp(self):
+        # Keep the shared ingestor (and Finnhub) out of it; record what would be subscribed upstream
+        self.forwarded = []
+
+        async def acquire(channel_name, symbols):
+            self.forwarded.append(list(symbols))
+
+        for name, fake in (("acquire_symbols", acquire), ("release_symbols", mock.AsyncMock())):
+            patcher = mock.patch(f"portfolio.consumers.{name}", new=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(LivePriceConsumer.as_asgi(), "/ws/prices/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_from()  # initial snapshot
+        return communicator
+
+    async def _send(self, communicator, message):
+        await communicator.send_to(text_data=message if isinstance(message, str) else json.dumps(message))
+        return json.loads(await communicator.receive_from())
+
+    async def test_malformed_frames_get_an_error_and_keep_the_socket(self):
+        communicator = await self._connect()
+        for frame, error in [
+            ("[]", "Expected a JSON object"),
+            ("not json", "Invalid JSON"),
+            ({"action": "subscribe", "symbols": "AAPL"}, "symbols must be a list of strings"),
+            ({"action": "subscribe", "symbols": [1, 2]}, "symbols must be a list of strings"),
+            ({"action": "subscribe", "symbols": ["X" * 120]}, "Invalid symbols: " + "X" * 20),
+            ({"action": "subscribe", "symbols": ["MS FT"]}, "Invalid symbols: MS FT"),
+        ]:
+            self.assertEqual(await self._send(communicator, frame), {"error": error})
+        # Still usable, and nothing invalid was forwarded upstream
+        reply = await self._send(communicator, {"action": "subscribe", "symbols": ["msft", "BINANCE:BTCUSDT"]})
+        self.assertEqual(reply, {"subscribed": ["AAPL", "MSFT", "BINANCE:BTCUSDT"]})
+        self.assertEqual(self.forwarded, [["AAPL"], ["MSFT", "BINANCE:BTCUSDT"]])
+        await communicator.disconnect()
+
+    @override_settings(PRICE_INGESTION_WORKER=True)
+    async def test_worker_mode_reacquires_held_symbols(self):
+        with mock.patch("portfolio.consumers.WORKER_REACQUIRE_INTERVAL", 0.01):
+            communicator = await self._connect()
+            await asyncio.sleep(0.05)
+            await communicator.disconnect()
+        # A restarted worker gets the socket's symbols again without the client doing anything
+        self.assertGreater(len(self.forwarded), 2)
+        self.assertTrue(all(symbols == ["AAPL"] for symbols in self.forwarded))
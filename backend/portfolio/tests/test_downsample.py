@@ -0,0 +1,37 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from portfolio.downsample import lttb, lttb_indices
+
+
+class LttbTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.arange(1000)
+        self.y = np.cumsum(rng.normal(size=1000))
+
+    def test_short_series_and_tiny_thresholds_are_kept_whole(self):
+        self.assertEqual(lttb_indices(self.x[:10], self.y[:10], 10).tolist(), list(range(10)))
+        self.assertEqual(len(lttb_indices(self.x, self.y, 2)), 1000)
+
+    def test_keeps_threshold_points_in_order_with_both_ends(self):
+        kept = lttb_indices(self.x, self.y, 100)
+        self.assertEqual(len(kept), 100)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertTrue((np.diff(kept) > 0).all())
+
+    def test_spikes_survive(self):
+        y = np.zeros(1000)
+        y[123], y[777] = 50.0, -50.0
+        kept = lttb_indices(self.x, y, 20)
+        self.assertIn(123, kept)
+        self.assertIn(777, kept)
+
+    def test_bars_are_thinned_row_for_row(self):
+        dates = np.datetime64("2020-01-01") + np.arange(1000)
+        bars = {"date": dates, "close": self.y, "volume": np.arange(1000)}
+        thinned = lttb(bars, 50)
+        self.assertEqual(len(thinned["date"]), 50)
+        # Every column keeps the same rows
+        self.assertEqual((thinned["date"] - dates[0]).astype(int).tolist(), thinned["volume"].tolist())
+        self.assertIs(lttb(bars, 1000), bars)
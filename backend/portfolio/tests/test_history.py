@@ -0,0 +1,163 @@
+from datetime import date, timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from portfolio.history import _backfill_if_missing, period_start, pick_tier, store_daily
+from portfolio.mock_views import _checked_key
+from portfolio.models import HistoricalPrice, HistoricalRollup
+from portfolio.trading_calendar import recent_trading_days, trading_days
+
+
+def _row(day, close=10.0, volume=100):
+    return HistoricalPrice(
+        symbol="TEST", date=day, open=close, high=close + 1, low=close - 1, close=close, volume=volume,
+    )
+
+
+@override_settings(HISTORY_DAILY_DAYS=260, HISTORY_WEEKLY_WEEKS=265, HISTORY_COLUMN_DIR="")
+class RollUpTests(TestCase):
+    def setUp(self):
+        self.days = trading_days(date(2026, 9, 1), date(2026, 10, 16))
+        store_daily("TEST", [_row(day) for day in self.days])
+
+    def _bar(self, period, start):
+        return HistoricalRollup.objects.get(symbol="TEST", period=period, date=start)
+
+    def test_rollups_cover_every_stored_day(self):
+        september = self._bar("1mo", date(2026, 9, 1))
+        self.assertEqual(september.days, len([d for d in self.days if d.month == 9]))
+        self.assertEqual(september.volume, 100 * september.days)
+        # Labor Day week has four sessions
+        self.assertEqual(self._bar("1w", date(2026, 9, 7)).days, 4)
+
+    def test_late_day_leaves_earlier_week_alone(self):
+        store_daily("TEST", [_row(date(2026, 10, 16), close=12.0)])
+        # Rows are reloaded from Oct 1, which cuts through the week of Sep 28
+        self.assertEqual(self._bar("1w", date(2026, 9, 28)).days, 5)
+        week = self._bar("1w", date(2026, 10, 12))
+        self.assertEqual((week.days, week.close), (5, 12.0))
+
+    def test_early_month_day_leaves_previous_month_alone(self):
+        september_days = self._bar("1mo", date(2026, 9, 1)).days
+        store_daily("TEST", [_row(date(2026, 10, 2), volume=500)])
+        self.assertEqual(self._bar("1mo", date(2026, 9, 1)).days, september_days)
+        # The week of Sep 28 spans both months and does include the new day
+        week = self._bar("1w", date(2026, 9, 28))
+        self.assertEqual((week.days, week.volume), (5, 4 * 100 + 500))
+
+    def test_pick_tier(self):
+        today = date.today()
+        self.assertEqual(pick_tier(today - timedelta(days=30)), "1d")
+        self.assertEqual(pick_tier(today - timedelta(days=30), "1w"), "1w")
+        # Older than the daily tier keeps: the finest tier that still has it
+        self.assertEqual(pick_tier(today - timedelta(days=3 * 365)), "1w")
+        self.assertEqual(pick_tier(today - timedelta(days=10 * 365)), "1mo")
+        # No start (range=ALL, or only ?to=) means the whole history
+        self.assertEqual(pick_tier(None), "1mo")
+
+    def test_period_start(self):
+        self.assertEqual(period_start(date(2026, 10, 16), "1w"), date(2026, 10, 12))
+        self.assertEqual(period_start(date(2026, 10, 16), "1mo"), date(2026, 10, 1))
+
+
+@override_settings(HISTORY_DAILY_DAYS=260, HISTORY_WEEKLY_WEEKS=265, HISTORY_COLUMN_DIR="")
+class DailySyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.days = recent_trading_days(30)
+        store_daily("TEST", [_row(day) for day in self.days[:-1]])
+
+    def test_session_missing_upstream_is_not_asked_for_again(self):
+        # Upstream has not published the last session yet
+        upstream = mock.AsyncMock(return_value=[_row(day) for day in self.days[:-1]])
+        with mock.patch("portfolio.mock_views.afetch_daily", upstream):
+            for _ in range(3):
+                response = self.client.get("/api/historical/prices/?symbol=TEST&range=1M")
+                self.assertEqual(response.status_code, 200)
+                cache.delete("sf:history:TEST:result")  # well past the single-flight result TTL
+            self.assertEqual(upstream.await_count, 1)
+
+            # Once the recheck interval is up the next load asks again and gets the day
+            self.assertEqual(cache.get(_checked_key("TEST")), self.days[-1])
+            cache.clear()
+            upstream.return_value = [_row(day) for day in self.days]
+            response = self.client.get("/api/historical/prices/?symbol=TEST&range=1M")
+        self.assertEqual(upstream.await_count, 2)
+        self.assertEqual(response.json()["prices"]["TEST"][-1]["date"], self.days[-1].isoformat())
+
+
+@override_settings(HISTORY_DAILY_DAYS=260, HISTORY_WEEKLY_WEEKS=265, HISTORY_COLUMN_DIR="")
+class HistoryRangeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Up to date through the last session, so no request syncs
+        self.days = recent_trading_days(30)
+        store_daily("TEST", [_row(day) for day in self.days])
+
+    def test_range_ending_before_the_daily_tier_is_served(self):
+        response = self.client.get(f"/api/historical/prices/?symbol=TEST&to={self.days[5].isoformat()}")
+        body = response.json()
+        self.assertEqual(body["interval"], "1mo")
+        self.assertEqual(body["prices"]["TEST"][0]["date"], period_start(self.days[0], "1mo").isoformat())
+        self.assertLessEqual(body["prices"]["TEST"][-1]["date"], self.days[5].isoformat())
+
+    def test_rows_from_before_rollups_are_rolled_up_by_the_migration(self):
+        # Daily rows written straight to the table, as they were before HistoricalRollup existed
+        HistoricalPrice.objects.all().delete()
+        HistoricalRollup.objects.all().delete()
+        HistoricalPrice.objects.bulk_create([_row(day) for day in self.days])
+        self.assertEqual(self.client.get("/api/historical/prices/?symbol=TEST&range=ALL").json()["prices"]["TEST"], [])
+
+        import_module("portfolio.migrations.0008_backfill_rollups").backfill_rollups(apps, None)
+        for query in ("range=ALL", "range=5Y", f"to={self.days[5].isoformat()}"):
+            cache.clear()
+            bars = self.client.get(f"/api/historical/prices/?symbol=TEST&{query}").json()["prices"]["TEST"]
+            self.assertEqual(bars[0]["date"], period_start(self.days[0], "1mo" if query != "range=5Y" else "1w").isoformat())
+        months = HistoricalRollup.objects.filter(symbol="TEST", period="1mo")
+        self.assertEqual(sum(months.values_list("days", flat=True)), len(self.days))
+
+    def test_etag_follows_the_resolved_window(self):
+        url = "/api/historical/prices/?symbol=TEST&range=1M"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Same query a day later: the window has moved, so the cached copy is stale
+        moved = (self.days[-1] - timedelta(days=29), None)
+        with mock.patch("portfolio.mock_views._range_bounds", return_value=moved):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(HISTORY_DAILY_DAYS=260, HISTORY_WEEKLY_WEEKS=265, HISTORY_COLUMN_DIR="", ALPHAVANTAGE_OUTPUTSIZE="compact")
+class BackfillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.days = recent_trading_days(30)
+
+    def _backfill(self, token_wait):
+        upstream = mock.Mock(return_value=[_row(day) for day in self.days])
+        with mock.patch("portfolio.history.acquire", side_effect=token_wait), \
+                mock.patch("portfolio.history._get_daily", upstream), \
+                mock.patch("portfolio.history.close_old_connections"):
+            _backfill_if_missing("TEST")
+        return upstream
+
+    def test_rate_limit_wait_happens_before_the_lock(self):
+        def token_wait(provider, priority):
+            # A chart load during the wait must not find the symbol locked
+            self.assertIsNone(cache.get("sf:history:TEST:lock"))
+
+        self.assertEqual(self._backfill(token_wait).call_count, 1)
+        self.assertEqual(HistoricalPrice.objects.filter(symbol="TEST").count(), len(self.days))
+
+    def test_symbol_loaded_during_the_wait_is_not_fetched_again(self):
+        def token_wait(provider, priority):
+            store_daily("TEST", [_row(day) for day in self.days])
+
+        self.assertEqual(self._backfill(token_wait).call_count, 0)
@@ -0,0 +1,75 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from portfolio import ingestion
+from portfolio.ingestion import HEALTH_KEY, FinnhubIngestor, PriceIngestionWorker
+
+
+@override_settings(PRICE_INGESTION_WORKER=False, TICK_RECORDER_DIR="")
+class IngestorLifecycleTests(SimpleTestCase):
+    async def test_symbols_acquired_while_stopping_are_still_subscribed(self):
+        ingestor = FinnhubIngestor(url="ws://unused")
+        sessions = []
+
+        async def ingest(channel_layer):
+            # Stands in for the upstream loop, which ends once nothing is held
+            sessions.append(sorted(ingestor.refcounts))
+            await ingestor.release("late")
+
+        async def flush():
+            if len(sessions) == 1:
+                await ingestor.acquire("late", ["AAPL"])  # arrives during run()'s final flush
+
+        ingestor._ingest = ingest
+        ingestor.bars.flush = flush
+        ingestor._ensure_running()
+        await ingestor._task
+        ingestor._idle_close.cancel()
+        self.assertEqual(sessions, [[], ["AAPL"]])
+        self.assertEqual(ingestor.health["status"], "idle")
+
+    async def test_worker_releases_owners_that_stop_reacquiring(self):
+        ingestor = FinnhubIngestor(url="ws://unused")
+        ingestor._ensure_running = lambda: None  # no upstream connection needed
+        worker = PriceIngestionWorker()
+        with mock.patch.object(ingestion, "_ingestor", ingestor), \
+                mock.patch.object(ingestion, "WORKER_REACQUIRE_INTERVAL", 0.02), \
+                mock.patch.object(ingestion, "OWNER_TTL", 0.06):
+            await worker.ingestion_acquire({"owner": "gone", "symbols": ["AAPL", "MSFT"]})
+            # "live" keeps re-acquiring like a connected socket; "gone"'s process died
+            for _ in range(10):
+                await worker.ingestion_acquire({"owner": "live", "symbols": ["MSFT"]})
+                await asyncio.sleep(0.02)
+            ingestor._expiry.cancel()
+        self.assertEqual(ingestor.refcounts, {"MSFT": 1})
+        self.assertEqual(set(ingestor.owners), {"live"})
+        self.assertEqual(set(ingestor.seen), {"live"})
+
+
+class IngestionHealthTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @override_settings(PRICE_INGESTION_WORKER=False)
+    def test_reports_this_process_ingestor(self):
+        with mock.patch.object(ingestion, "_ingestor", None):
+            response = self.client.get("/api/ingestion/health/")
+            self.assertEqual((response.status_code, response.json()["status"]), (200, "idle"))
+
+        ingestor = FinnhubIngestor(url="ws://unused")
+        ingestor.health["status"] = "reconnecting"
+        # Another process's state in the shared key does not leak into this one
+        cache.set(HEALTH_KEY, {"status": "connected"})
+        with mock.patch.object(ingestion, "_ingestor", ingestor):
+            response = self.client.get("/api/ingestion/health/")
+        self.assertEqual((response.status_code, response.json()["status"]), (503, "reconnecting"))
+
+    @override_settings(PRICE_INGESTION_WORKER=True)
+    def test_reports_the_worker(self):
+        self.assertEqual(self.client.get("/api/ingestion/health/").status_code, 200)
+        cache.set(HEALTH_KEY, {"status": "reconnecting"})
+        self.assertEqual(self.client.get("/api/ingestion/health/").status_code, 503)
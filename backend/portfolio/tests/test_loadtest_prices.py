@@ -0,0 +1,23 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from portfolio.management.commands.loadtest_prices import Command
+
+
+class LoadtestHarnessTests(SimpleTestCase):
+    async def test_in_process_client_connects_with_memory_layer(self):
+        command = Command()
+        opts = {"url": None, "fake_port": 8765, "max_rate": 4.0, "layer": "memory"}
+        # Only the socket path is under test; keep the ingestor from dialling the fake
+        with override_settings(**command._overrides(opts)), \
+                mock.patch("portfolio.consumers.acquire_symbols", new=mock.AsyncMock()), \
+                mock.patch("portfolio.consumers.release_symbols", new=mock.AsyncMock()):
+            client = command._make_client(opts)
+            await client.connect()
+            snapshot = await client.recv(timeout=5)
+            await client.close()
+        self.assertIsInstance(snapshot, str)
+        json.loads(snapshot)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+from portfolio.ratelimit import BACKGROUND, INTERACTIVE, RateLimited, RateLimiter, _LocalBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class LocalBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("portfolio.ratelimit.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buckets = _LocalBuckets()
+
+    def test_full_bucket_then_refill_wait(self):
+        # 5 tokens, refilled at 5 per minute
+        waits = [self.buckets.take("k", 5, 5 / 60, 0) for _ in range(6)]
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[5], 12.0)
+        self.clock.sleep(12)
+        self.assertEqual(self.buckets.take("k", 5, 5 / 60, 0), 0.0)
+
+    def test_floor_is_held_back(self):
+        # A floor of 1 leaves the last token for callers without one
+        waits = [self.buckets.take("k", 5, 5 / 60, 1) for _ in range(5)]
+        self.assertEqual(waits[:4], [0.0] * 4)
+        self.assertGreater(waits[4], 0)
+        self.assertEqual(self.buckets.take("k", 5, 5 / 60, 0), 0.0)
+
+    def test_refill_is_capped_at_capacity(self):
+        self.buckets.take("k", 5, 5 / 60, 0)
+        self.clock.sleep(3600)
+        waits = [self.buckets.take("k", 5, 5 / 60, 0) for _ in range(6)]
+        self.assertEqual(waits.count(0.0), 5)
+
+
+@override_settings(ALPHAVANTAGE_RATE_LIMIT=5)
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("portfolio.ratelimit.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches = mock.patch("portfolio.ratelimit.caches", {"default": LocMemCache("ratelimit-tests", {})})
+        caches.start()
+        self.addCleanup(caches.stop)
+        self.limiter = RateLimiter()
+
+    def test_interactive_gives_up_after_max_wait(self):
+        for _ in range(5):
+            self.limiter.acquire("alphavantage", INTERACTIVE)
+        with self.assertRaises(RateLimited) as ctx:
+            self.limiter.acquire("alphavantage", INTERACTIVE, max_wait=1)
+        self.assertAlmostEqual(ctx.exception.retry_after, 12.0)
+        metrics = self.limiter.metrics()["alphavantage"][INTERACTIVE]
+        self.assertEqual((metrics["calls"], metrics["rejected"]), (6, 1))
+
+    def test_background_waits_and_leaves_reserve(self):
+        # Reserve is 20% of 5 tokens, so background gets 4 before it has to wait
+        waits = [self.limiter.acquire("alphavantage", BACKGROUND) for _ in range(5)]
+        self.assertEqual(waits[:4], [0.0] * 4)
+        self.assertAlmostEqual(waits[4], 12.0)
+        metrics = self.limiter.metrics()["alphavantage"][BACKGROUND]
+        self.assertEqual((metrics["calls"], metrics["throttled"]), (5, 1))
@@ -0,0 +1,47 @@
+from datetime import date, datetime
+
+from django.test import SimpleTestCase
+
+from portfolio.trading_calendar import (
+    MARKET_TZ,
+    holidays,
+    is_trading_day,
+    last_completed_session,
+    previous_trading_day,
+    recent_trading_days,
+    trading_days,
+)
+
+
+class TradingCalendarTests(SimpleTestCase):
+    def test_sessions_per_year(self):
+        self.assertEqual(len(trading_days(date(2023, 1, 1), date(2023, 12, 31))), 250)
+        self.assertEqual(len(trading_days(date(2024, 1, 1), date(2024, 12, 31))), 252)
+
+    def test_holidays_2025(self):
+        self.assertEqual(sorted(holidays(2025)), [
+            date(2025, 1, 1), date(2025, 1, 20), date(2025, 2, 17), date(2025, 4, 18),
+            date(2025, 5, 26), date(2025, 6, 19), date(2025, 7, 4), date(2025, 9, 1),
+            date(2025, 11, 27), date(2025, 12, 25),
+        ])
+
+    def test_observance(self):
+        # Independence Day 2026 is a Saturday, observed Friday
+        self.assertIn(date(2026, 7, 3), holidays(2026))
+        # New Year's Day 2022 was a Saturday and is not made up on Dec 31
+        self.assertTrue(is_trading_day(date(2021, 12, 31)))
+        self.assertNotIn(date(2021, 12, 31), holidays(2022))
+        # Juneteenth only from 2022
+        self.assertTrue(is_trading_day(date(2021, 6, 18)))
+        self.assertFalse(is_trading_day(date(2025, 1, 9)))  # special closure
+
+    def test_previous_and_recent(self):
+        self.assertEqual(previous_trading_day(date(2026, 9, 8)), date(2026, 9, 4))  # over Labor Day weekend
+        days = recent_trading_days(3, end=date(2026, 9, 8))
+        self.assertEqual(days, [date(2026, 9, 3), date(2026, 9, 4), date(2026, 9, 8)])
+
+    def test_last_completed_session(self):
+        at = lambda *args: datetime(*args, tzinfo=MARKET_TZ)
+        self.assertEqual(last_completed_session(at(2026, 10, 16, 16, 29)), date(2026, 10, 15))
+        self.assertEqual(last_completed_session(at(2026, 10, 16, 16, 30)), date(2026, 10, 16))
+        self.assertEqual(last_completed_session(at(2026, 10, 18, 12, 0)), date(2026, 10, 16))  # Sunday
@@ -0,0 +1,130 @@
+"""Append-only tick recorder for the live trade stream.
+
+Trades are appended to per-day, per-symbol column files of fixed-width
+little-endian values::
+
+    {TICK_RECORDER_DIR}/{YYYYMMDD}/{SYMBOL}.ts      int64   trade time (ms since epoch)
+    {TICK_RECORDER_DIR}/{YYYYMMDD}/{SYMBOL}.price   float64
+    {TICK_RECORDER_DIR}/{YYYYMMDD}/{SYMBOL}.volume  float64
+
+The files have no header, so appending is a plain write and ``load_ticks``
+maps them with ``numpy.memmap`` without copying.
+"""
+import os
+import re
+import time
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+
+COLUMNS = {"ts": "<i8", "price": "<f8", "volume": "<f8"}
+FLUSH_EVERY = 5000   # buffered trades before a flush
+FLUSH_INTERVAL = 1.0  # seconds between flushes otherwise
+MAX_OPEN_FILES = 256
+
+
+def _safe_symbol(symbol):
+    # Exchange-prefixed symbols (BINANCE:BTCUSDT) are not valid file names everywhere
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", symbol)
+
+
+def _day(ts_ms):
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y%m%d")
+
+
+class TickRecorder:
+    def __init__(self, root):
+        self.root = root
+        self.buffers = {}  # (day, symbol) -> {"ts": [], "price": [], "volume": []}
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.files = {}    # (day, symbol, column) -> open file, in least-recently-used order
+
+    async def record(self, trades):
+        """Buffer one Finnhub trade message; flushes off the event loop when due."""
+        for trade in trades:
+            buf = self.buffers.setdefault(
+                (_day(trade["t"]), _safe_symbol(trade["s"])), {col: [] for col in COLUMNS}
+            )
+            buf["ts"].append(trade["t"])
+            buf["price"].append(trade["p"])
+            buf["volume"].append(trade.get("v") or 0.0)
+        self.buffered += len(trades)
+        if self.buffered >= FLUSH_EVERY or time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            buffers, self.buffers, self.buffered = self.buffers, {}, 0
+            self.last_flush = time.monotonic()
+            await asyncio.to_thread(self._write, buffers)
+
+    def _file(self, day, symbol, column):
+        key = (day, symbol, column)
+        fh = self.files.pop(key, None)
+        if fh is None:
+            os.makedirs(os.path.join(self.root, day), exist_ok=True)
+            fh = open(os.path.join(self.root, day, f"{symbol}.{column}"), "ab")
+            if len(self.files) >= MAX_OPEN_FILES:
+                oldest = next(iter(self.files))
+                self.files.pop(oldest).close()
+        self.files[key] = fh
+        return fh
+
+    def _write(self, buffers):
+        for (day, symbol), buf in buffers.items():
+            for column, dtype in COLUMNS.items():
+                fh = self._file(day, symbol, column)
+                np.asarray(buf[column], dtype=dtype).tofile(fh)
+                fh.flush()
+
+    def close(self):
+        if self.buffers:
+            self._write(self.buffers)
+            self.buffers, self.buffered = {}, 0
+        for fh in self.files.values():
+            fh.close()
+        self.files = {}
+
+
+def load_ticks(root, symbol, day):
+    """Zero-copy read of one symbol/day; returns {"ts", "price", "volume"} arrays.
+
+    ``day`` is a date, datetime or ``YYYYMMDD`` string. Columns are trimmed to
+    a common length in case the recorder stopped in the middle of a flush.
+    """
+    if not isinstance(day, str):
+        day = day.strftime("%Y%m%d")
+    arrays = {}
+    for column, dtype in COLUMNS.items():
+        path = os.path.join(root, day, f"{_safe_symbol(symbol)}.{column}")
+        if os.path.exists(path) and os.path.getsize(path) >= np.dtype(dtype).itemsize:
+            arrays[column] = np.memmap(path, dtype=dtype, mode="r")
+        else:
+            arrays[column] = np.empty(0, dtype=dtype)
+    n = min(len(a) for a in arrays.values())
+    return {column: a[:n] for column, a in arrays.items()}
+
+
+def replay_messages(day_dir):
+    """Yield Finnhub-shaped trade messages for a recorded day in timestamp order."""
+    symbols = sorted({name.rsplit(".", 1)[0] for name in os.listdir(day_dir)})
+    root, day = os.path.split(os.path.normpath(day_dir))
+    ts, prices, volumes, syms = [], [], [], []
+    for idx, sym in enumerate(symbols):
+        ticks = load_ticks(root, sym, day)
+        ts.append(ticks["ts"])
+        prices.append(ticks["price"])
+        volumes.append(ticks["volume"])
+        syms.append(np.full(len(ticks["ts"]), idx, dtype=np.int32))
+    if not ts:
+        return
+    ts, prices, volumes, syms = (np.concatenate(a) for a in (ts, prices, volumes, syms))
+    order = np.argsort(ts, kind="stable")
+    batch, batch_t = [], None
+    for i in order:
+        t = int(ts[i])
+        if batch and t != batch_t:
+            yield {"type": "trade", "data": batch}
+            batch = []
+        batch_t = t
+        batch.append({"s": symbols[syms[i]], "p": float(prices[i]), "t": t, "v": float(volumes[i])})
+    if batch:
+        yield {"type": "trade", "data": batch}
@@ -0,0 +1,118 @@
+"""US equity (NYSE/Nasdaq) trading calendar.
+
+Enough of the exchange calendar to tell which daily bars should exist:
+weekends, the regular full-day holidays (with the Saturday/Sunday observance
+rules) and the one-off closures listed in SPECIAL_CLOSURES. Holidays are
+computed from their rules, so there is no table to keep up to date each year.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+# Alpha Vantage publishes the day's bar a little after the 16:00 close
+DAILY_BAR_READY = time(16, 30)
+
+SPECIAL_CLOSURES = frozenset({
+    date(2012, 10, 29),  # Hurricane Sandy
+    date(2012, 10, 30),
+    date(2018, 12, 5),   # National day of mourning, George H. W. Bush
+    date(2025, 1, 9),    # National day of mourning, Jimmy Carter
+})
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """The n-th ``weekday`` (Mon=0) of the month; n=-1 is the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=64)
+def holidays(year):
+    """Full-day market holidays in ``year``."""
+    days = {
+        _nth_weekday(year, 1, 0, 3),        # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),        # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),       # Memorial Day
+        _observed(date(year, 7, 4)),        # Independence Day
+        _nth_weekday(year, 9, 0, 1),        # Labor Day
+        _nth_weekday(year, 11, 3, 4),       # Thanksgiving
+        _observed(date(year, 12, 25)),      # Christmas
+    }
+    # New Year's Day on a Saturday is not made up on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days)
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in holidays(day.year) and day not in SPECIAL_CLOSURES
+
+
+def trading_days(start, end):
+    """Trading days in [start, end], oldest first."""
+    days = []
+    day = start
+    while day <= end:
+        if is_trading_day(day):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def previous_trading_day(day):
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def recent_trading_days(count, end=None):
+    """The last ``count`` trading days up to ``end`` (default: the last completed session), oldest first."""
+    day = end or last_completed_session()
+    days = []
+    while len(days) < count:
+        if is_trading_day(day):
+            days.append(day)
+        day -= timedelta(days=1)
+    days.reverse()
+    return days
+
+
+def last_completed_session(now=None):
+    """Date of the newest daily bar the upstream should already have."""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    today = now.date()
+    if is_trading_day(today) and now.time() >= DAILY_BAR_READY:
+        return today
+    return previous_trading_day(today)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PortfolioViewSet, StockViewSet, InterestedStockViewSet, finnhub_stock_search, prices, user_interested_prices, batch_prices
-from .mock_views import historical_prices
+from .views import PortfolioViewSet, StockViewSet, InterestedStockViewSet, finnhub_stock_search, prices, user_interested_prices, batch_prices, ingestion_health, upstream_limits, price_cache_stats, watchlist_snapshot
+from .mock_views import historical_prices, intraday_bars
 
 router = DefaultRouter()
 router.register(r'portfolios', PortfolioViewSet, basename='portfolio')
@@ -13,6 +13,11 @@ urlpatterns = [
     path('', include(router.urls)),
     path('prices/', prices, name='prices'),
     path('user-interested-prices/', user_interested_prices, name='user-interested-prices'),
+    path('watchlist/snapshot/', watchlist_snapshot, name='watchlist-snapshot'),
     path('historical/prices/', historical_prices, name='historical-prices'),
+    path('historical/intraday/', intraday_bars, name='intraday-bars'),
     path('search/', finnhub_stock_search, name='finnhub-stock-search'),
+    path('ingestion/health/', ingestion_health, name='ingestion-health'),
+    path('upstream/limits/', upstream_limits, name='upstream-limits'),
+    path('prices/cache-stats/', price_cache_stats, name='price-cache-stats'),
 ]
@@ -1,77 +1,74 @@
+import asyncio
+from functools import wraps
+
+from django.http import HttpResponseNotAllowed, JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from django.core.cache import cache
 
-# Utility: normalize any cached value into a consistent dict shape
-def _normalize_cached_price(cached):
-    """Return a dict with latestPrice, change, changePercent, timestamp or None."""
-    if isinstance(cached, dict):
-        # Ensure required keys exist
-        return {
-            "latestPrice": cached.get("latestPrice"),
-            "change": cached.get("change"),
-            "changePercent": cached.get("changePercent"),
-            "timestamp": cached.get("timestamp"),
-        }
-    if isinstance(cached, (int, float)):
-        return {
-            "latestPrice": float(cached),
-            "change": None,
-            "changePercent": None,
-            "timestamp": None,
-        }
-    return None
+from .price_store import PriceRecord, empty_price, price_store
+from .quotes import aget_quote, aread_quotes
+from .etags import not_modified, weak_etag, with_etag
+from .watchlists import aget_watchlist, get_watchlist
+
+
+def require_GET_async(view):
+    """require_GET for async views (Django 4.2's decorator only wraps sync ones)."""
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method != "GET":
+            return HttpResponseNotAllowed(["GET"])
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+async def _fetch_quotes(symbols, deadline):
+    """Fetch quotes concurrently; symbols not back within `deadline` seconds get an error entry.
+
+    Each fetch is single-flighted, so concurrent requests missing the same
+    symbol share one upstream call.
+    """
+    tasks = {asyncio.ensure_future(aget_quote(sym, deadline)): sym for sym in symbols}
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+    results = {}
+    for task in done:
+        sym = tasks[task]
+        try:
+            results[sym] = task.result()
+        except Exception as e:
+            results[sym] = empty_price(sym, error=str(e))
+    for task in not_done:
+        task.cancel()
+        sym = tasks[task]
+        results[sym] = empty_price(sym, error=f"Timed out after {deadline}s")
+    return results
+
 
 # New endpoint: fetch prices for a list of symbols
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def batch_prices(request):
+@require_GET_async
+async def batch_prices(request):
     user_id = request.GET.get("user_id")
     if user_id:
-        symbols = list(InterestedStock.objects.filter(user_id=user_id).values_list('symbol', flat=True))
+        symbols = await aget_watchlist(user_id)
     else:
         symbols = request.GET.get("symbols")
         if not symbols:
-            return Response({"error": "No symbols provided"}, status=400)
+            return JsonResponse({"error": "No symbols provided"}, status=400)
         symbols = [s.strip().upper() for s in symbols.split(",") if s.strip()]
-    import requests
     from django.conf import settings
-    results = []
-    for sym in symbols:
-        cached = cache.get(f"price:{sym}")
-        norm = _normalize_cached_price(cached)
-        if norm is not None:
-            results.append({"symbol": sym, **norm})
-        else:
-            # Fetch live data from Finnhub API
-            url = f"https://finnhub.io/api/v1/quote?symbol={sym}&token={settings.FINNHUB_API_KEY}"
-            try:
-                r = requests.get(url, timeout=10)
-                data = r.json()
-                price = data.get("c")
-                prev_price = data.get("pc")
-                change = price - prev_price if price is not None and prev_price is not None else None
-                change_percent = (change / prev_price * 100) if (change is not None and prev_price) else None
-                result = {
-                    "symbol": sym,
-                    "latestPrice": price,
-                    "change": change,
-                    "changePercent": change_percent,
-                    "timestamp": None,
-                }
-                results.append(result)
-                # Optionally cache the result
-                cache.set(f"price:{sym}", result, timeout=300)
-            except Exception as e:
-                results.append({
-                    "symbol": sym,
-                    "latestPrice": None,
-                    "change": None,
-                    "changePercent": None,
-                    "timestamp": None,
-                    "error": str(e),
-                })
-    return Response(results)
+    # Stale entries are returned as-is and refreshed in the background
+    found = {sym: record.as_dict(sym) for sym, record in (await aread_quotes(symbols)).items()}
+
+    # Fetch misses from Finnhub concurrently, bounded by a per-request deadline
+    misses = [sym for sym in dict.fromkeys(symbols) if sym not in found]
+    if misses:
+        fetched = await _fetch_quotes(misses, settings.BATCH_PRICES_DEADLINE)
+        found.update(fetched)
+        await price_store.aset_quotes({sym: PriceRecord.from_update(r) for sym, r in fetched.items() if "error" not in r})
+    results = [found[sym] for sym in symbols]
+    # Unchanged prices/tick timestamps since the last poll -> 304
+    etag = weak_etag([tuple(r.values()) for r in results])
+    return not_modified(request, etag) or with_etag(JsonResponse(results, safe=False), etag)
 
     
 from rest_framework.decorators import api_view, permission_classes
@@ -80,50 +77,36 @@ from rest_framework.response import Response
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_interested_prices(request):
-    print("[DEBUG] user_interested_prices endpoint called")
-    print(f"[DEBUG] request.META: {request.META}")
-    print(f"[DEBUG] raw QUERY_STRING: {request.META.get('QUERY_STRING', '')}")
-    print(f"[DEBUG] user_id param: {user_id}")
-    print(f"[DEBUG] user_id param: {user_id}")
-    import urllib.parse
-    query_string = request.META.get('QUERY_STRING', '')
-    params = urllib.parse.parse_qs(query_string)
-    user_id = params.get('user_id', [None])[0]
-    if user_id:
-        symbols = list(InterestedStock.objects.filter(user_id=user_id).values_list('symbol', flat=True))
-        print(f"[DEBUG] symbols for user_id {user_id}: {symbols}")
-        if not symbols:
-            print(f"[DEBUG] No interested symbols found for user_id {user_id}")
-    else:
-        user = request.user
-        symbols = list(InterestedStock.objects.filter(user=user).values_list('symbol', flat=True))
-        print(f"[DEBUG] symbols for request.user {user}: {symbols}")
-        if not symbols:
-            print(f"[DEBUG] No interested symbols found for request.user {user}")
-    results = []
-    for sym in symbols:
-        print(sym,'----------')
-        cached = cache.get(f"price:{sym}")
-        norm = _normalize_cached_price(cached)
-        if norm is not None:
-            results.append({"symbol": sym, **norm})
-            print(norm,'--------')
-        else:
-            results.append({
-                "symbol": sym,
-                "latestPrice": None,
-                "change": None,
-                "changePercent": None,
-                "timestamp": None,
-            })
-    return Response(results)
+    user_id = request.GET.get('user_id') or request.user.id
+    symbols = get_watchlist(user_id)
+    records = price_store.get_many(symbols)
+    results = [records[sym].as_dict(sym) if sym in records else empty_price(sym) for sym in symbols]
+    etag = weak_etag([tuple(r.values()) for r in results])
+    return not_modified(request, etag) or with_etag(Response(results), etag)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def watchlist_snapshot(request):
+    """The user's watchlist with latest prices.
+
+    Two cache round-trips regardless of size: the cached symbol set, then
+    one MGET for every price (fewer when the in-process L1 has them).
+    """
+    symbols = get_watchlist(request.user.id)
+    records = price_store.get_many(symbols)
+    prices = [records[sym].as_dict(sym) if sym in records else empty_price(sym) for sym in symbols]
+    etag = weak_etag(symbols, [tuple(p.values()) for p in prices])
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return with_etag(Response({"symbols": symbols, "prices": prices}), etag)
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from django.core.cache import cache
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def prices(request):
+@require_GET_async
+async def prices(request):
     # Accepts ?symbol=TSLA or ?symbols=TSLA,AMZN
     symbol = request.GET.get("symbol")
     symbols = request.GET.get("symbols")
@@ -134,31 +117,24 @@ def prices(request):
     else:
         return JsonResponse({"error": "No symbol(s) provided"}, status=400)
 
-    results = []
-    for sym in symbol_list:
-        cached = cache.get(f"price:{sym}")
-        norm = _normalize_cached_price(cached)
-        if norm is not None:
-            results.append({"symbol": sym, **norm})
-        else:
-            # If not in cache, return nulls
-            results.append({
-                "symbol": sym,
-                "latestPrice": None,
-                "change": None,
-                "changePercent": None,
-                "timestamp": None,
-            })
+    # One round-trip for all symbols; unknown symbols come back as nulls
+    records = await aread_quotes(symbol_list)
+    results = [records[sym].as_dict(sym) if sym in records else empty_price(sym) for sym in symbol_list]
+    etag = weak_etag([tuple(r.values()) for r in results])
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
     if len(results) == 1:
-        return JsonResponse(results[0])
-    return JsonResponse(results, safe=False)
-import requests
+        return with_etag(JsonResponse(results[0]), etag)
+    return with_etag(JsonResponse(results, safe=False), etag)
+import math
 from django.http import JsonResponse
-from django.views.decorators.http import require_GET
 from django.conf import settings
+from .ratelimit import RateLimited, aacquire, limiter_metrics
+from .http_clients import ahttp_get
 # Finnhub stock search endpoint
-@require_GET
-def finnhub_stock_search(request):
+@require_GET_async
+async def finnhub_stock_search(request):
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'results': []})
@@ -167,9 +143,15 @@ def finnhub_stock_search(request):
     if not api_key:
         return JsonResponse({'error': 'Finnhub API key not configured'}, status=500)
 
-    url = f'https://finnhub.io/api/v1/search?q={query}&token={api_key}'
+    url = f'{settings.FINNHUB_API_URL}/search?q={query}&token={api_key}'
     try:
-        resp = requests.get(url, timeout=5)
+        await aacquire("finnhub")
+    except RateLimited as e:
+        response = JsonResponse({'error': str(e)}, status=429)
+        response['Retry-After'] = str(math.ceil(e.retry_after))
+        return response
+    try:
+        resp = await ahttp_get("finnhub", url, timeout=(3.05, 5))
         resp.raise_for_status()
         data = resp.json()
         results = []
@@ -291,3 +273,33 @@ class InterestedStockViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
         obj.delete()
         return Response({"deleted": True, "symbol": symbol}, status=status.HTTP_200_OK)
+
+
+from .ingestion import ingestor_health
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def ingestion_health(request):
+    """Status of the live price ingestor; 503 while the upstream feed is down.
+
+    Without the dedicated worker every process has its own ingestor, and this
+    reports the one in the process that answers.
+    """
+    health = ingestor_health()
+    healthy = health.get("status") in ("connected", "idle")
+    return Response(health, status=200 if healthy else 503)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def upstream_limits(request):
+    """Shared Finnhub/Alpha Vantage rate-limit counters per priority class."""
+    return Response(limiter_metrics())
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def price_cache_stats(request):
+    """Hit/miss counters of this process's in-memory price cache (L1)."""
+    return Response(price_store.l1_stats())
@@ -0,0 +1,45 @@
+"""Cached per-user watchlists (InterestedStock symbol sets).
+
+The symbol list for a user lives under ``watchlist:{user_id}`` so price
+endpoints don't hit the database on every poll. ``portfolio.signals`` drops
+the entry whenever an InterestedStock is saved or deleted. WATCHLIST_TTL only
+bounds how long a change made through ``QuerySet.update()``/``bulk_create``
+(which send no signals) can go unnoticed.
+"""
+from django.core.cache import cache
+
+from . import aio_cache
+from .models import InterestedStock
+
+WATCHLIST_TTL = 3600
+
+
+def watchlist_key(user_id):
+    return f"watchlist:{user_id}"
+
+
+def _query(user_id):
+    return InterestedStock.objects.filter(user_id=user_id).order_by("added_at").values_list("symbol", flat=True)
+
+
+def get_watchlist(user_id):
+    """Upper-cased symbols on ``user_id``'s watchlist, oldest first."""
+    key = watchlist_key(user_id)
+    symbols = cache.get(key)
+    if symbols is None:
+        symbols = [s.upper() for s in _query(user_id)]
+        cache.set(key, symbols, timeout=WATCHLIST_TTL)
+    return symbols
+
+
+async def aget_watchlist(user_id):
+    key = watchlist_key(user_id)
+    symbols = await aio_cache.aget(key)
+    if symbols is None:
+        symbols = [s.upper() async for s in _query(user_id)]
+        await aio_cache.aset(key, symbols, timeout=WATCHLIST_TTL)
+    return symbols
+
+
+def invalidate_watchlist(user_id):
+    cache.delete(watchlist_key(user_id))
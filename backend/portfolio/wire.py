@@ -0,0 +1,87 @@
+"""Wire formats for the live price WebSocket.
+
+Clients pick one with ``?format=`` or the matching subprotocol
+(``prices.json``, ``prices.columnar``, ``prices.msgpack``):
+
+- json (default): ``{"prices": [{symbol, latestPrice, change, changePercent, timestamp}, ...]}``
+- columnar: parallel arrays keyed by field name. Symbols are sent once as a
+  dictionary; each frame carries ``symbols`` with only the entries that are
+  new since the previous frame, and ``idx`` indexes into the accumulated list::
+
+      {"symbols": ["AAPL"], "idx": [0], "latestPrice": [...], "change": [...],
+       "changePercent": [...], "timestamp": [...]}
+
+- msgpack: the columnar frame packed with MessagePack, sent as binary frames.
+
+Errors are always sent as JSON text frames.
+"""
+import json
+import msgpack
+
+COLUMNS = ("latestPrice", "change", "changePercent", "timestamp")
+
+
+class JSONEncoder:
+    binary = False
+
+    def encode(self, updates, snapshot=False):
+        payload = {"prices": updates}
+        if snapshot:
+            payload["snapshot"] = True
+        return json.dumps(payload)
+
+
+class ColumnarEncoder:
+    binary = False
+
+    def __init__(self):
+        self.index = {}  # symbol -> position in the client's dictionary
+
+    def frame(self, updates, snapshot=False):
+        new_symbols = []
+        idx = []
+        for update in updates:
+            sym = update["symbol"]
+            if sym not in self.index:
+                self.index[sym] = len(self.index)
+                new_symbols.append(sym)
+            idx.append(self.index[sym])
+        payload = {"symbols": new_symbols, "idx": idx}
+        for col in COLUMNS:
+            payload[col] = [u.get(col) for u in updates]
+        if snapshot:
+            payload["snapshot"] = True
+        return payload
+
+    def encode(self, updates, snapshot=False):
+        return json.dumps(self.frame(updates, snapshot), separators=(",", ":"))
+
+
+class MessagePackEncoder(ColumnarEncoder):
+    binary = True
+
+    def encode(self, updates, snapshot=False):
+        return msgpack.packb(self.frame(updates, snapshot))
+
+
+ENCODERS = {
+    "json": JSONEncoder,
+    "columnar": ColumnarEncoder,
+    "msgpack": MessagePackEncoder,
+}
+SUBPROTOCOL_PREFIX = "prices."
+
+
+def select_encoder(fmt=None, subprotocols=()):
+    """Return (encoder, accepted_subprotocol) for the client's request.
+
+    An explicit ``format`` query parameter wins over subprotocol negotiation;
+    unknown formats fall back to plain JSON.
+    """
+    if fmt in ENCODERS:
+        return ENCODERS[fmt](), None
+    for proto in subprotocols:
+        name = proto[len(SUBPROTOCOL_PREFIX):] if proto.startswith(SUBPROTOCOL_PREFIX) else None
+        if name in ENCODERS:
+            return ENCODERS[name](), proto
+    return JSONEncoder(), None
@@ -9,7 +9,7 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 import django
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 # import stockapp.routing  # 👈 replace `stockapp` with your actual app name
@@ -18,6 +18,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stocktracker.settings')
 django.setup()
 import portfolio.routing  # 👈 add this line to import your routing
+from portfolio.ingestion import INGESTION_CHANNEL, PriceIngestionWorker
 
 # HTTP (Django views) + WebSocket (Channels)
 application = ProtocolTypeRouter({
@@ -27,4 +28,8 @@ application = ProtocolTypeRouter({
             portfolio.routing.websocket_urlpatterns
         )
     ),
+    # Dedicated ingestion worker: python manage.py runworker price-ingestion
+    "channel": ChannelNameRouter({
+        INGESTION_CHANNEL: PriceIngestionWorker.as_asgi(),
+    }),
 })
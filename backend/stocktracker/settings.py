@@ -13,6 +13,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY', default='django-insecure-your-secret-key-here')
 ALPHAVANTAGE_API_KEY = config("ALPHAVANTAGE_API_KEY")
 FINNHUB_API_KEY = config("FINNHUB_API_KEY")
+# Finnhub endpoints; point these at `manage.py fake_finnhub` for offline runs
+FINNHUB_WS_URL = config("FINNHUB_WS_URL", default="wss://ws.finnhub.io")
+FINNHUB_API_URL = config("FINNHUB_API_URL", default="https://finnhub.io/api/v1")
 # OpenRouter (AI) settings
 OPENROUTER_API_KEY = config('OPENROUTER_API_KEY', default='')
 OPENROUTER_MODEL = config('OPENROUTER_MODEL', default='deepseek/deepseek-chat-v3.1:free')
@@ -44,6 +47,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # Compress large JSON (candle lists, price snapshots) for the polling frontend
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -208,6 +213,45 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Live prices: when True, web processes hand symbol subscriptions to the
+# dedicated ingestion worker (manage.py runworker price-ingestion) instead of
+# holding the upstream Finnhub socket themselves.
+PRICE_INGESTION_WORKER = config('PRICE_INGESTION_WORKER', default=False, cast=bool)
+# Layer between price sockets and the ingestor. Without the worker every
+# process runs its own ingestor for its own sockets, so ticks and status stay
+# in process memory; the worker reaches every process through Redis.
+CHANNEL_LAYERS["prices"] = (
+    CHANNEL_LAYERS["default"] if PRICE_INGESTION_WORKER
+    else {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+)
+# Upper bound on pushes per second per price socket (0 disables conflation);
+# clients can request less with ?max_rate=
+PRICE_PUSH_MAX_RATE = config('PRICE_PUSH_MAX_RATE', default=4, cast=float)
+# Seconds batch_prices waits for upstream quotes on cache misses before
+# returning partial results
+BATCH_PRICES_DEADLINE = config('BATCH_PRICES_DEADLINE', default=3, cast=float)
+# Directory for the append-only tick recorder (per-day column files); empty disables it
+TICK_RECORDER_DIR = config('TICK_RECORDER_DIR', default='')
+# Days of intraday bars kept in IntradayBar
+INTRADAY_BAR_RETENTION_DAYS = config('INTRADAY_BAR_RETENTION_DAYS', default=30, cast=int)
+# Most requested symbols each process keeps refreshed ahead of expiry; 0 disables
+HOT_SYMBOL_COUNT = config('HOT_SYMBOL_COUNT', default=50, cast=int)
+# Upstream request budgets per minute, shared by all processes through Redis
+FINNHUB_RATE_LIMIT = config('FINNHUB_RATE_LIMIT', default=60, cast=int)
+ALPHAVANTAGE_RATE_LIMIT = config('ALPHAVANTAGE_RATE_LIMIT', default=5, cast=int)
+# In-process L1 in front of the Redis price cache: max symbols (0 disables) and TTL in seconds
+PRICE_L1_SIZE = config('PRICE_L1_SIZE', default=2000, cast=int)
+PRICE_L1_TTL = config('PRICE_L1_TTL', default=1.0, cast=float)
+# Daily bars kept per symbol (trading days) and weekly rollups kept (weeks,
+# a little over five years so 5Y charts stay weekly); monthly rollups are never pruned
+HISTORY_DAILY_DAYS = config('HISTORY_DAILY_DAYS', default=260, cast=int)
+HISTORY_WEEKLY_WEEKS = config('HISTORY_WEEKLY_WEEKS', default=265, cast=int)
+# Alpha Vantage outputsize for a symbol's first history load: 'compact' (100 days)
+# or 'full' (20+ years, premium keys only)
+ALPHAVANTAGE_OUTPUTSIZE = config('ALPHAVANTAGE_OUTPUTSIZE', default='compact')
+# Directory for the memory-mapped daily history column store; empty reads the table directly
+HISTORY_COLUMN_DIR = config('HISTORY_COLUMN_DIR', default='')
+
 # Email settings
 # Defaults to console backend for development. Override via environment for SMTP.
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')